@@ -16,9 +16,17 @@ import re
 import json
 import hashlib
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Alignment string patterns for explicit extraction
 # Matches both full names and abbreviations
 ALIGNMENT_PATTERNS = [
@@ -45,14 +53,146 @@ ALIGNMENT_PATTERNS = [
     (r'\bCE\b', (-1.0, -1.0)),
 ]
 
+# All alignment patterns combined into a single case-insensitive alternation,
+# one named group per pattern. The lowest group index found wins, keeping the
+# list-order priority of ALIGNMENT_PATTERNS. Every pattern starts at a word
+# boundary on l/n/c/t, so check that first to skip most positions cheaply.
+_ALIGNMENT_RE = re.compile(
+    r"\b(?=[lnct])(?:" + "|".join(
+        f"(?P<p{i}>{pattern})" for i, (pattern, _) in enumerate(ALIGNMENT_PATTERNS)
+    ) + ")",
+    re.IGNORECASE
+)
+
+# Number of relationships classified per LLM request
+RELATIONSHIP_BATCH_SIZE = 8
+
+# Relationship verbs clear enough to classify without the LLM, mapped to
+# (type, moral_valence, order_valence). Only matched in the active voice,
+# directly after the source entity's name
+RELATIONSHIP_RULES = {
+    "killed": ("killed", -0.7, -0.3),
+    "slew": ("killed", -0.7, -0.3),
+    "murdered": ("killed", -0.9, -0.5),
+    "destroyed": ("destroyed", -0.5, -0.4),
+    "saved": ("saved", 0.8, 0.2),
+    "rescued": ("saved", 0.8, 0.2),
+    "betrayed": ("betrayed", -0.8, -0.8),
+    "allied": ("allied", 0.3, 0.3),
+    "traded": ("traded", 0.0, 0.2),
+    "helped": ("helped", 0.5, 0.1),
+    "harmed": ("harmed", -0.6, -0.2),
+}
+
+# Sentence breaks used to trim link context to the sentence naming the target
+_SENTENCE_BREAK_RE = re.compile(r'[.!?]\s+')
+
+_RELATIONSHIP_VERBS = "|".join(RELATIONSHIP_RULES)
+_RELATIONSHIP_VERB_RE = re.compile(r"\b(" + _RELATIONSHIP_VERBS + r")\b", re.IGNORECASE)
+
+# Characters of an entity's content included in its classification prompt.
+# Bump ENTITY_PROMPT_VERSION whenever the entity prompt changes, so cached
+# results from the old prompt aren't reused
+ENTITY_PROMPT_CONTENT_CHARS = 3000
+ENTITY_PROMPT_VERSION = 1
+
+# Structured output schemas, so the API always returns parseable JSON
+ENTITY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "entity_alignment",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "law_chaos": {"type": "number"},
+                "good_evil": {"type": "number"},
+                "confidence": {"type": "number"},
+                "reasoning": {"type": "string"}
+            },
+            "required": ["law_chaos", "good_evil", "confidence", "reasoning"],
+            "additionalProperties": False
+        }
+    }
+}
+
+RELATIONSHIP_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "relationship_classifications",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "relationships": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "type": {"type": "string"},
+                            "moral_valence": {"type": "number"},
+                            "order_valence": {"type": "number"},
+                            "summary": {"type": "string"}
+                        },
+                        "required": ["index", "type", "moral_valence", "order_valence", "summary"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["relationships"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Maximum number of LLM requests in flight at once
+LLM_CONCURRENCY = 8
 
-def compute_content_hash(content: str) -> str:
+# Relationship types whose moral weight depends on who the target is
+HARM_RELATIONSHIP_TYPES = frozenset({"killed", "destroyed", "harmed"})
+
+# Seconds between status checks while waiting on an OpenAI Batch API job
+BATCH_POLL_INTERVAL = 30
+
+# Longest time to wait on an OpenAI Batch API job before giving up on it, so
+# a slow batch can't hold a CI run until the job timeout
+BATCH_MAX_WAIT = 4 * 60 * 60
+
+
+def clip(value: float, low: float = -1.0, high: float = 1.0) -> float:
     """
-    Compute SHA256 hash of content for cache keying.
-    Uses first 2000 chars for efficiency while maintaining uniqueness.
+    Clamp value to [low, high] without the call overhead of nested min/max.
+    NaN clamps to high, as min(high, nan) would.
     """
-    truncated = content[:2000] if content else ""
-    return hashlib.sha256(truncated.encode('utf-8')).hexdigest()[:16]
+    return low if value < low else value if value < high else high
+
+
+# OpenAI clients by API key, reused so requests share one connection pool
+_openai_clients = {}
+
+
+def get_openai_client(api_key: str):
+    """
+    Return a shared OpenAI client for api_key, creating it on first use.
+    """
+    client = _openai_clients.get(api_key)
+    if client is None:
+        from openai import OpenAI
+        # Retry rate limits and transient errors with exponential backoff
+        client = _openai_clients[api_key] = OpenAI(api_key=api_key, max_retries=5)
+    return client
+
+
+def compute_content_hash(title: str, content: str) -> str:
+    """
+    Compute BLAKE2b hash of an entity for cache keying.
+    Covers the entity prompt version, the title and the part of the content
+    the prompt includes, so changing any of them invalidates the cached result.
+    """
+    truncated = content[:ENTITY_PROMPT_CONTENT_CHARS] if content else ""
+    key = f"{ENTITY_PROMPT_VERSION}:{title}:{truncated}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
 
 
 def compute_relationship_hash(source_id: str, target_id: str, context: str) -> str:
@@ -60,9 +200,53 @@ def compute_relationship_hash(source_id: str, target_id: str, context: str) -> s
     Compute hash for relationship cache keying.
     """
     key = f"{source_id}:{target_id}:{context[:500]}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def compute_legacy_content_hashes(content: str) -> list:
+    """
+    Compute the content-only keys used by older caches: the versioned
+    prompt-slice key, then BLAKE2b and SHA256 of the first 2000 chars. The
+    last two still hold only when the content is no longer than that, since
+    the prompt has always included 3000 chars. None of them cover the title,
+    so callers should check the title stored with the entry.
+    """
+    truncated = content[:ENTITY_PROMPT_CONTENT_CHARS] if content else ""
+    versioned = f"{ENTITY_PROMPT_VERSION}:{truncated}"
+    keys = [hashlib.blake2b(versioned.encode('utf-8'), digest_size=8).hexdigest()]
+    if len(truncated) <= 2000:
+        keys.append(hashlib.blake2b(truncated.encode('utf-8'), digest_size=8).hexdigest())
+        keys.append(hashlib.sha256(truncated.encode('utf-8')).hexdigest()[:16])
+    return keys
+
+
+def compute_legacy_relationship_hash(source_id: str, target_id: str, context: str) -> str:
+    """
+    Compute the SHA256 relationship key used by caches written before BLAKE2b.
+    """
+    key = f"{source_id}:{target_id}:{context[:500]}"
     return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
 
 
+def migrate_cache_entry(
+    cache: dict, section: str, key: str, *legacy_keys: str, title: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Move a cache entry stored under a legacy key to its current key.
+
+    If title is given, only entries recorded for that title are moved.
+    Returns the entry, or None if the cache has none of the keys.
+    """
+    entries = cache.get(section, {})
+    for legacy_key in legacy_keys:
+        entry = entries.get(legacy_key)
+        if entry is None or (title is not None and entry.get("title") != title):
+            continue
+        entries[key] = entries.pop(legacy_key)
+        return entries[key]
+    return None
+
+
 def load_cache(cache_path: str) -> dict:
     """
     Load alignment cache from file.
@@ -70,6 +254,9 @@ def load_cache(cache_path: str) -> dict:
     """
     if os.path.exists(cache_path):
         try:
+            if orjson:
+                with open(cache_path, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(cache_path, 'r') as f:
                 return json.load(f)
         except (json.JSONDecodeError, IOError) as e:
@@ -84,13 +271,28 @@ def load_cache(cache_path: str) -> dict:
 def save_cache(cache: dict, cache_path: str) -> None:
     """
     Save alignment cache to file.
+
+    Writes to a temporary file in the same directory and renames it into
+    place, so an interrupted save never leaves a truncated cache behind.
     """
+    temp_path = None
     try:
-        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-        with open(cache_path, 'w') as f:
-            json.dump(cache, f, indent=2)
+        cache_dir = os.path.dirname(cache_path) or "."
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".alignment_cache.", suffix=".tmp", dir=cache_dir)
+        if orjson:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+        else:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache, f, indent=2)
+        # mkstemp creates the file owner-only; keep the usual cache permissions
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, cache_path)
     except IOError as e:
         print(f"Warning: Could not save cache to {cache_path}: {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 def extract_stated_alignment(content: str) -> Optional[dict]:
@@ -103,54 +305,98 @@ def extract_stated_alignment(content: str) -> Optional[dict]:
     if not content:
         return None
 
-    content_lower = content.lower()
-
-    for pattern, (law_chaos, good_evil) in ALIGNMENT_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            return {
-                "law_chaos": law_chaos,
-                "good_evil": good_evil,
-                "confidence": 1.0,
-                "source": "explicit"
-            }
+    # Resume one character past each match start rather than at its end so
+    # a match can't hide an overlapping higher-priority one
+    best = None
+    match = _ALIGNMENT_RE.search(content)
+    while match:
+        index = int(match.lastgroup[1:])
+        if best is None or index < best:
+            best = index
+            if best == 0:
+                break
+        match = _ALIGNMENT_RE.search(content, match.start() + 1)
+
+    if best is not None:
+        law_chaos, good_evil = ALIGNMENT_PATTERNS[best][1]
+        return {
+            "law_chaos": law_chaos,
+            "good_evil": good_evil,
+            "confidence": 1.0,
+            "source": "explicit"
+        }
 
     return None
 
 
-def classify_relationship_llm(
-    source_title: str,
-    target_title: str,
-    context: str,
-    api_key: str,
-    cache: dict,
-    cache_path: str
-) -> Optional[dict]:
+def title_pattern(title: str) -> str:
+    """
+    Build a regex matching an entity's full title, or its first word when
+    that is distinctive enough, the same way extract_link_context does.
+    """
+    first_word = title.split()[0] if ' ' in title else title
+    names = [re.escape(title)]
+    if len(first_word) > 3 and first_word != title:
+        names.append(re.escape(first_word))
+    return r"\b(?:" + "|".join(names) + r")\b"
+
+
+def classify_relationship_rules(source_title: str, target_title: str, context: str) -> Optional[dict]:
     """
-    Stage 2: Classify a relationship using LLM.
+    Classify a relationship from its context by keyword, without the LLM.
 
-    Extracts the relationship type and moral/order valence from context.
-    Results are cached by relationship hash.
+    A rule only applies when the source names the verb in the active voice
+    and the target follows it in the same clause, e.g. "Aldric slew the
+    dragon Vexx". Contexts with no such match, or whose known verbs map to
+    more than one relationship type, return None and are left to the LLM.
     """
-    if not api_key:
+    if not source_title or not target_title:
         return None
 
-    # Check cache first
-    rel_hash = compute_relationship_hash(source_title, target_title, context)
-    if rel_hash in cache.get("relationships", {}):
-        cached = cache["relationships"][rel_hash]
-        return cached.get("result")
+    # At most one adverb between source and verb, so "X was killed by Y"
+    # never matches as X killing Y
+    pattern = re.compile(
+        title_pattern(source_title) + r"\s+(?:\w+ly\s+)?(" + _RELATIONSHIP_VERBS + r")\b"
+        r"[^,;:.!?]{0,40}?" + title_pattern(target_title),
+        re.IGNORECASE
+    )
+    if not pattern.search(context):
+        return None
+
+    matches = {RELATIONSHIP_RULES[verb.lower()] for verb in _RELATIONSHIP_VERB_RE.findall(context)}
+    if len(matches) != 1:
+        return None
+
+    rel_type, moral_valence, order_valence = matches.pop()
+    return {
+        "type": rel_type,
+        "moral_valence": moral_valence,
+        "order_valence": order_valence,
+        "summary": f"{rel_type} (keyword match)",
+        "source": "rule"
+    }
 
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
 
-        prompt = f"""Analyze this relationship between two entities in a D&D fantasy setting (the world of Pyora).
+def classify_relationship_group(client, batch: list[tuple[str, str, str, str]]) -> dict[str, dict]:
+    """
+    Classify one group of relationships with a single LLM request.
 
-Source entity: {source_title}
-Target entity: {target_title}
-Context: {context}
+    Each item in batch is a (source_title, target_title, context, rel_hash)
+    tuple. Returns dict mapping rel_hash to the classification result.
+    """
+    listing = "\n\n".join(
+        f"{i}. Source entity: {source_title}\n"
+        f"   Target entity: {target_title}\n"
+        f"   Context: {context}"
+        for i, (source_title, target_title, context, _) in enumerate(batch, start=1)
+    )
 
-Classify the relationship and its moral implications. Return a JSON object with:
+    prompt = f"""Analyze these {len(batch)} relationships between entities in a D&D fantasy setting (the world of Pyora).
+
+{listing}
+
+Classify each relationship and its moral implications. Return a JSON object with a "relationships" array holding one object per relationship above, each with:
+- "index": the number of the relationship in the list above
 - "type": the relationship type (e.g., "killed", "saved", "betrayed", "allied", "traded", "helped", "harmed", "employed", "served", "created", "destroyed", "neutral")
 - "moral_valence": float from -1.0 (evil act) to 1.0 (good act)
 - "order_valence": float from -1.0 (chaotic act) to 1.0 (lawful act)
@@ -165,71 +411,121 @@ Consider:
 
 Return ONLY the JSON object, no other text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=200
-        )
-
-        result_text = response.choices[0].message.content.strip()
-
-        # Parse JSON from response (handle markdown code blocks)
-        if result_text.startswith("```"):
-            result_text = re.sub(r'^```(?:json)?\n?', '', result_text)
-            result_text = re.sub(r'\n?```$', '', result_text)
-
-        result = json.loads(result_text)
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3,
+        max_tokens=200 * len(batch),
+        response_format=RELATIONSHIP_RESPONSE_FORMAT
+    )
+
+    result_text = response.choices[0].message.content.strip()
+    classified = json.loads(result_text).get("relationships", [])
+
+    results = {}
+    for result in classified:
+        index = int(result.pop("index", 0)) - 1
+        if not 0 <= index < len(batch):
+            continue
 
         # Validate and clamp values
-        result["moral_valence"] = max(-1.0, min(1.0, float(result.get("moral_valence", 0))))
-        result["order_valence"] = max(-1.0, min(1.0, float(result.get("order_valence", 0))))
-
-        # Cache the result
-        cache.setdefault("relationships", {})[rel_hash] = {
-            "result": result,
-            "timestamp": datetime.now().isoformat(),
-            "source": source_title,
-            "target": target_title
-        }
-        save_cache(cache, cache_path)
+        result["moral_valence"] = clip(float(result.get("moral_valence", 0)))
+        result["order_valence"] = clip(float(result.get("order_valence", 0)))
 
-        return result
+        results[batch[index][3]] = result
 
-    except Exception as e:
-        print(f"Warning: LLM classification failed for {source_title} -> {target_title}: {e}")
-        return None
+    return results
 
 
-def classify_entity_llm(
-    title: str,
-    content: str,
+def classify_relationships_batch(
+    pending: list[tuple[str, str, str, str]],
     api_key: str,
     cache: dict,
-    cache_path: str
-) -> Optional[dict]:
+    batch_size: int = RELATIONSHIP_BATCH_SIZE,
+    concurrency: int = LLM_CONCURRENCY
+) -> dict[str, dict]:
     """
-    Classify an entity's alignment using LLM when no explicit alignment found.
-
-    Results are cached by content hash.
+    Stage 2: Classify uncached relationships using LLM, several per request.
+
+    Each item in pending is a (source_title, target_title, context, rel_hash)
+    tuple. Relationships the keyword rules can decide are classified by rule
+    first; those results are cheap to recompute and are never cached, so a
+    change to the rules takes effect on the next run. Up to batch_size of the
+    rest share one prompt and come back as a single JSON array, so API
+    round-trips drop by roughly batch_size. Up to concurrency requests are in
+    flight at once. LLM results are added to the cache by relationship hash;
+    the caller saves it.
+
+    Returns dict mapping rel_hash to the classification result.
     """
-    if not api_key or not content:
-        return None
+    results = {}
+    if not api_key or not pending:
+        return results
+
+    # One timestamp for every entry cached by this call
+    timestamp = datetime.now().isoformat()
+
+    # Skip the LLM for relationships the keyword rules can decide
+    remaining = []
+    for source_title, target_title, context, rel_hash in pending:
+        result = classify_relationship_rules(source_title, target_title, context)
+        if result is None:
+            remaining.append((source_title, target_title, context, rel_hash))
+            continue
+        results[rel_hash] = result
 
-    # Check cache first
-    content_hash = compute_content_hash(content)
-    if content_hash in cache.get("entities", {}):
-        cached = cache["entities"][content_hash]
-        return cached.get("alignment")
+    if results:
+        print(f"  Classified {len(results)} relationships by keyword rules")
+
+    if not remaining:
+        return results
 
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
+    except Exception as e:
+        print(f"Warning: Could not create OpenAI client: {e}")
+        return results
+
+    batches = [remaining[start:start + batch_size] for start in range(0, len(remaining), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(classify_relationship_group, client, batch) for batch in batches]
+
+        # Collect in submission order so the cache is filled deterministically
+        for batch, future in zip(batches, futures):
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                first_source, first_target = batch[0][0], batch[0][1]
+                print(f"Warning: LLM classification failed for batch of {len(batch)} relationships "
+                      f"starting at {first_source} -> {first_target}: {e}")
+                continue
 
-        # Truncate content for API call
-        truncated_content = content[:3000] if len(content) > 3000 else content
+            for source_title, target_title, _, rel_hash in batch:
+                result = batch_results.get(rel_hash)
+                if result is None:
+                    continue
 
-        prompt = f"""Analyze this entity from a D&D fantasy setting (the world of Pyora) and determine their alignment.
+                # Cache the result
+                cache.setdefault("relationships", {})[rel_hash] = {
+                    "result": result,
+                    "timestamp": timestamp,
+                    "source": source_title,
+                    "target": target_title
+                }
+                results[rel_hash] = result
+
+    return results
+
+
+def build_entity_prompt(title: str, content: str) -> str:
+    """
+    Build the LLM prompt used to classify an entity's alignment.
+    """
+    # Truncate content for API call
+    truncated_content = content[:ENTITY_PROMPT_CONTENT_CHARS]
+
+    return f"""Analyze this entity from a D&D fantasy setting (the world of Pyora) and determine their alignment.
 
 Entity: {title}
 Description: {truncated_content}
@@ -249,42 +545,204 @@ Consider:
 If there's not enough information, set confidence low and values near 0.
 Return ONLY the JSON object, no other text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=150
-        )
 
-        result_text = response.choices[0].message.content.strip()
+def parse_entity_response(result_text: str) -> dict:
+    """
+    Parse an entity classification response into a clamped alignment dict.
+    """
+    result = json.loads(result_text)
+
+    return {
+        "law_chaos": clip(float(result.get("law_chaos", 0))),
+        "good_evil": clip(float(result.get("good_evil", 0))),
+        "confidence": clip(float(result.get("confidence", 0.5)), 0.0),
+        "source": "llm"
+    }
 
-        # Parse JSON from response
-        if result_text.startswith("```"):
-            result_text = re.sub(r'^```(?:json)?\n?', '', result_text)
-            result_text = re.sub(r'\n?```$', '', result_text)
 
-        result = json.loads(result_text)
+def classify_entity_request(client, title: str, content: str) -> dict:
+    """
+    Classify one entity's alignment with a single LLM request.
 
-        alignment = {
-            "law_chaos": max(-1.0, min(1.0, float(result.get("law_chaos", 0)))),
-            "good_evil": max(-1.0, min(1.0, float(result.get("good_evil", 0)))),
-            "confidence": max(0.0, min(1.0, float(result.get("confidence", 0.5)))),
-            "source": "llm"
-        }
+    Raises on API or parsing errors; the caller reports them.
+    """
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": build_entity_prompt(title, content)}],
+        temperature=0.3,
+        max_tokens=150,
+        response_format=ENTITY_RESPONSE_FORMAT
+    )
 
-        # Cache the result
-        cache.setdefault("entities", {})[content_hash] = {
-            "alignment": alignment,
-            "timestamp": datetime.now().isoformat(),
-            "title": title
-        }
-        save_cache(cache, cache_path)
+    return parse_entity_response(response.choices[0].message.content)
+
+
+def classify_entities_llm(
+    pending: list[tuple[str, str, str]],
+    api_key: str,
+    cache: dict,
+    concurrency: int = LLM_CONCURRENCY
+) -> dict[str, dict]:
+    """
+    Stage 2: Classify uncached entities using LLM, one request per entity.
 
-        return alignment
+    Each item in pending is a (title, content, content_hash) tuple, with each
+    content_hash appearing once. Up to concurrency requests are in flight at
+    once. Workers only return results; the cache is filled on the calling
+    thread in submission order. Results are added to the cache by content
+    hash; the caller saves it.
 
+    Returns dict mapping content_hash to alignment for every entity classified.
+    """
+    results = {}
+    if not api_key or not pending:
+        return results
+
+    try:
+        client = get_openai_client(api_key)
     except Exception as e:
-        print(f"Warning: LLM entity classification failed for {title}: {e}")
-        return None
+        print(f"Warning: Could not create OpenAI client: {e}")
+        return results
+
+    # One timestamp for every entry cached by this call
+    timestamp = datetime.now().isoformat()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(classify_entity_request, client, title, content)
+            for title, content, _ in pending
+        ]
+
+        for count, ((title, _, content_hash), future) in enumerate(zip(pending, futures), start=1):
+            if count % 10 == 0:
+                print(f"  Progress: {count}/{len(pending)} entities classified")
+            try:
+                alignment = future.result()
+            except Exception as e:
+                print(f"Warning: LLM entity classification failed for {title}: {e}")
+                continue
+
+            # Cache the result
+            cache.setdefault("entities", {})[content_hash] = {
+                "alignment": alignment,
+                "timestamp": timestamp,
+                "title": title
+            }
+            results[content_hash] = alignment
+
+    return results
+
+
+def classify_entities_batch_api(
+    pending: list[tuple[str, str, str]],
+    api_key: str,
+    cache: dict,
+    poll_interval: int = BATCH_POLL_INTERVAL,
+    max_wait: int = BATCH_MAX_WAIT
+) -> dict[str, dict]:
+    """
+    Classify uncached entities through the OpenAI Batch API.
+
+    Each item in pending is a (title, content, content_hash) tuple. All
+    requests are uploaded as one JSONL file and processed asynchronously by
+    OpenAI at reduced cost; this blocks, polling every poll_interval seconds,
+    until the batch finishes or max_wait seconds have passed. Errors while
+    polling are retried, and an expired batch's partial output is still
+    read. Results are cached by content hash.
+
+    Returns dict mapping content_hash to alignment for every entity classified.
+    """
+    results = {}
+    if not api_key or not pending:
+        return results
+
+    batch_id = None
+    try:
+        client = get_openai_client(api_key)
+
+        titles = {}
+        lines = []
+        for title, content, content_hash in pending:
+            if content_hash in titles:
+                continue
+            titles[content_hash] = title
+            lines.append(json.dumps({
+                "custom_id": content_hash,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "gpt-4o-mini",
+                    "messages": [{"role": "user", "content": build_entity_prompt(title, content)}],
+                    "temperature": 0.3,
+                    "max_tokens": 150,
+                    "response_format": ENTITY_RESPONSE_FORMAT
+                }
+            }))
+
+        batch_input = client.files.create(
+            file=("alignment_entities.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        batch_id = batch.id
+        print(f"  Submitted batch {batch_id} with {len(lines)} entity classifications")
+
+        deadline = time.monotonic() + max_wait
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() >= deadline:
+                print(f"Warning: Batch {batch_id} still {batch.status} after {max_wait}s, "
+                      f"giving up; its results can be collected later by batch id")
+                return results
+            time.sleep(poll_interval)
+            try:
+                batch = client.batches.retrieve(batch_id)
+            except Exception as e:
+                # The batch keeps running server side, so keep polling
+                print(f"  Warning: Could not check batch {batch_id} status, retrying: {e}")
+                continue
+            print(f"  Batch {batch_id} status: {batch.status}")
+
+        # An expired batch still has output for the requests it finished
+        if batch.status not in ("completed", "expired") or not batch.output_file_id:
+            print(f"Warning: Batch {batch_id} ended with status {batch.status}, no entities classified")
+            return results
+        if batch.status == "expired":
+            print(f"  Batch {batch_id} expired, reading its partial output")
+
+        output = client.files.content(batch.output_file_id).text
+        timestamp = datetime.now().isoformat()
+
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            content_hash = record.get("custom_id")
+            try:
+                body = record["response"]["body"]
+                alignment = parse_entity_response(body["choices"][0]["message"]["content"])
+            except Exception as e:
+                print(f"Warning: LLM entity classification failed for {titles.get(content_hash)}: {e}")
+                continue
+
+            # Cache the result
+            cache.setdefault("entities", {})[content_hash] = {
+                "alignment": alignment,
+                "timestamp": timestamp,
+                "title": titles.get(content_hash)
+            }
+            results[content_hash] = alignment
+
+    except Exception as e:
+        if batch_id:
+            print(f"Warning: Batch entity classification failed for batch {batch_id}: {e}")
+        else:
+            print(f"Warning: Batch entity classification failed: {e}")
+
+    return results
 
 
 def calculate_behavioral_alignment(
@@ -327,22 +785,17 @@ def calculate_behavioral_alignment(
         moral = rel.get("moral_valence", 0)
         order = rel.get("order_valence", 0)
 
-        # Weight by severity (absolute value of impact)
-        weight = (abs(moral) + abs(order)) / 2
-        if weight < 0.1:
-            weight = 0.1  # Minimum weight for any relationship
+        # Weight by severity (absolute value of impact), with a minimum
+        # weight for any relationship
+        weight = max((abs(moral) + abs(order)) / 2, 0.1)
 
-        # Adjust moral valence based on target's alignment
-        target_id = rel.get("target_id")
-        if target_id and target_id in target_alignments:
-            target_align = target_alignments[target_id]
-            target_good_evil = target_align.get("final", {}).get("good_evil", 0)
-
-            # Killing evil is less evil than killing good
-            if rel.get("type") in ["killed", "destroyed", "harmed"]:
+        # Killing evil is less evil than killing good
+        if rel.get("type") in HARM_RELATIONSHIP_TYPES:
+            target_align = target_alignments.get(rel.get("target_id"))
+            if target_align:
                 # If target is evil (negative), reduce the evil impact
-                moral_adjustment = target_good_evil * 0.3  # Up to 30% reduction
-                moral = moral - moral_adjustment
+                target_good_evil = target_align.get("final", {}).get("good_evil", 0)
+                moral = moral - target_good_evil * 0.3  # Up to 30% reduction
 
         total_moral_impact += moral * weight
         total_order_impact += order * weight
@@ -362,8 +815,8 @@ def calculate_behavioral_alignment(
 
     # Clamp to valid range
     return {
-        "law_chaos": max(-1.0, min(1.0, behavioral_law_chaos)),
-        "good_evil": max(-1.0, min(1.0, behavioral_good_evil))
+        "law_chaos": clip(behavioral_law_chaos),
+        "good_evil": clip(behavioral_good_evil)
     }
 
 
@@ -416,14 +869,10 @@ def calculate_drift(stated: Optional[dict], final: dict) -> float:
     return min(1.0, distance / max_distance)
 
 
-def propagate_alignments(nodes: list[dict], links: list[dict], max_iterations: int = 10) -> None:
+def build_adjacency(links: list[dict]) -> dict[str, list[str]]:
     """
-    Stage 4: Propagate alignments to unclassified entities.
-
-    Entities with no alignment inherit weighted average from connected entities.
-    Uses iterative approach similar to PageRank.
+    Build an undirected adjacency map of node IDs from links.
     """
-    # Build adjacency map
     adjacency = {}
     for link in links:
         source = link.get("source") if isinstance(link.get("source"), str) else link.get("source", {}).get("id")
@@ -433,37 +882,62 @@ def propagate_alignments(nodes: list[dict], links: list[dict], max_iterations: i
             adjacency.setdefault(source, []).append(target)
             adjacency.setdefault(target, []).append(source)
 
-    # Create node lookup
-    node_map = {n["id"]: n for n in nodes}
+    return adjacency
+
+
+def propagate_alignments(
+    nodes: list[dict],
+    links: list[dict],
+    max_iterations: int = 10,
+    node_map: Optional[dict[str, dict]] = None,
+    adjacency: Optional[dict[str, list[str]]] = None
+) -> None:
+    """
+    Stage 4: Propagate alignments to unclassified entities.
+
+    Entities with no alignment inherit weighted average from connected entities.
+    Uses iterative approach similar to PageRank. Callers that already have a
+    node lookup or adjacency map can pass them in to avoid rebuilding them.
+    """
+    if adjacency is None:
+        adjacency = build_adjacency(links)
+
+    if node_map is None:
+        node_map = {n["id"]: n for n in nodes}
+
+    # Resolve each unclassified node's neighbors once. Duplicate links are
+    # kept so they still count multiple times in the weighted average.
+    unaligned = [
+        (node, [node_map[nid] for nid in adjacency.get(node["id"], []) if nid in node_map])
+        for node in nodes
+        if node.get("alignment") is None
+    ]
 
     for iteration in range(max_iterations):
         changes = 0
+        remaining = []
 
-        for node in nodes:
-            if node.get("alignment") is not None:
-                continue
-
+        # Nodes are still updated in order within a sweep, so alignments
+        # propagated earlier in the sweep are visible to later nodes
+        for node, neighbors in unaligned:
             # Get neighbors with alignment
-            neighbors = adjacency.get(node["id"], [])
             neighbor_alignments = []
 
-            for neighbor_id in neighbors:
-                neighbor = node_map.get(neighbor_id)
-                if neighbor and neighbor.get("alignment"):
-                    align = neighbor["alignment"]
-                    if align.get("final"):
-                        neighbor_alignments.append({
-                            "law_chaos": align["final"]["law_chaos"],
-                            "good_evil": align["final"]["good_evil"],
-                            "confidence": align.get("confidence", 0.5)
-                        })
+            for neighbor in neighbors:
+                align = neighbor.get("alignment")
+                if align and align.get("final"):
+                    neighbor_alignments.append((
+                        align["final"]["law_chaos"],
+                        align["final"]["good_evil"],
+                        align.get("confidence", 0.5)
+                    ))
 
             if neighbor_alignments:
                 # Weighted average by confidence
-                total_weight = sum(a["confidence"] for a in neighbor_alignments)
+                total_weight = sum(conf for _, _, conf in neighbor_alignments)
                 if total_weight > 0:
-                    avg_law = sum(a["law_chaos"] * a["confidence"] for a in neighbor_alignments) / total_weight
-                    avg_good = sum(a["good_evil"] * a["confidence"] for a in neighbor_alignments) / total_weight
+                    avg_law = sum(law * conf for law, _, conf in neighbor_alignments) / total_weight
+                    avg_good = sum(good * conf for _, good, conf in neighbor_alignments) / total_weight
 
                     node["alignment"] = {
                         "stated": None,
@@ -474,6 +948,11 @@ def propagate_alignments(nodes: list[dict], links: list[dict], max_iterations: i
                         "source": "propagated"
                     }
                     changes += 1
+                    continue
+
+            remaining.append((node, neighbors))
+
+        unaligned = remaining
 
         if changes == 0:
             break
@@ -486,8 +965,9 @@ def classify_alignments(
     links: list[dict],
     alignment_collections: dict[str, str],
     cache_path: str,
-    api_key: Optional[str] = None
-) -> None:
+    api_key: Optional[str] = None,
+    use_batch_api: bool = False
+) -> bool:
     """
     Main entry point: Run the full alignment classification pipeline.
 
@@ -499,163 +979,242 @@ def classify_alignments(
         alignment_collections: Dict mapping collection type to UUID
         cache_path: Path to alignment cache file
         api_key: OpenAI API key (optional, disables LLM if not provided)
+        use_batch_api: Classify uncached entities through the OpenAI Batch API
+            instead of one request per entity (cheaper, but may take hours)
+
+    Returns:
+        True if every entity and relationship sent to the LLM came back
+        classified, False if any request failed or a batch didn't finish
     """
     print(f"Starting alignment classification for {len(nodes)} nodes")
 
     # Load cache
     cache = load_cache(cache_path)
 
+    # Cleared when any LLM request fails, so callers know the run is partial
+    complete = True
+
     # Get set of collection IDs that should have alignment
     alignment_collection_ids = set(alignment_collections.values())
 
     # Build node lookup for relationship classification
     node_map = {n["id"]: n for n in nodes}
 
-    # Stage 1 & 2: Classify each entity
-    classified_count = 0
-    llm_count = 0
-    explicit_count = 0
-    skipped_count = 0
-    eligible_count = 0
+    # Partition nodes once; only eligible nodes are visited by later stages
+    eligible_nodes = []
+    for node in nodes:
+        if node.get("collectionId") in alignment_collection_ids:
+            eligible_nodes.append(node)
+        else:
+            node["alignment"] = None
 
-    print(f"Alignment-eligible collection IDs: {alignment_collection_ids}")
+    try:
+        # Stage 1 & 2: Classify each entity
+        classified_count = 0
+        llm_count = 0
+        explicit_count = 0
+        skipped_count = len(nodes) - len(eligible_nodes)
+        eligible_count = 0
 
-    # Debug: check if content is being extracted
-    sample_nodes = [n for n in nodes if n.get("collectionId") in alignment_collection_ids][:3]
-    for sn in sample_nodes:
-        content_len = len(sn.get("content", ""))
-        print(f"  Sample node '{sn.get('title', 'unknown')[:30]}': content length = {content_len}")
+        print(f"Alignment-eligible collection IDs: {alignment_collection_ids}")
 
-    for i, node in enumerate(nodes):
-        # Skip nodes not in alignment collections
-        if node.get("collectionId") not in alignment_collection_ids:
-            node["alignment"] = None
-            skipped_count += 1
-            continue
+        # Debug: check if content is being extracted
+        for sn in eligible_nodes[:3]:
+            content_len = len(sn.get("content", ""))
+            print(f"  Sample node '{sn.get('title', 'unknown')[:30]}': content length = {content_len}")
 
-        eligible_count += 1
-        content = node.get("content", "")
+        pending_entities = []
 
-        # Stage 1: Try explicit extraction
-        stated = extract_stated_alignment(content)
+        for node in eligible_nodes:
+            eligible_count += 1
+            content = node.get("content", "")
 
-        if stated:
-            explicit_count += 1
-            node["_stated_alignment"] = stated
-            classified_count += 1
-            if eligible_count % 50 == 0:
-                print(f"  Progress: {eligible_count} eligible nodes processed, {explicit_count} explicit, {llm_count} LLM")
-            continue
+            # Stage 1: Try explicit extraction
+            stated = extract_stated_alignment(content)
 
-        # If no explicit alignment and we have API key, try LLM
-        if api_key:
-            if eligible_count % 10 == 0:
-                print(f"  Progress: {eligible_count} eligible nodes, calling LLM for '{node.get('title', 'unknown')[:30]}...'")
-            stated = classify_entity_llm(
-                node["title"],
-                content,
-                api_key,
-                cache,
-                cache_path
-            )
             if stated:
-                llm_count += 1
+                explicit_count += 1
                 node["_stated_alignment"] = stated
                 classified_count += 1
-            else:
-                node["_stated_alignment"] = None
-        else:
+                if eligible_count % 50 == 0:
+                    print(f"  Progress: {eligible_count} eligible nodes processed, {explicit_count} explicit, {llm_count} LLM")
+                continue
+
             node["_stated_alignment"] = None
 
-    print(f"Stage 1-2 complete:")
-    print(f"  - Eligible nodes: {eligible_count}")
-    print(f"  - Skipped (wrong collection): {skipped_count}")
-    print(f"  - Explicit alignments found: {explicit_count}")
-    print(f"  - LLM classifications: {llm_count}")
-    print(f"  - Total classified: {classified_count}")
+            # If no explicit alignment and we have API key, queue for LLM
+            if api_key and content:
+                pending_entities.append(node)
+
+        # Stage 2: Classify entities without explicit alignment using LLM.
+        # Cache hits are resolved here, and each uncached content hash is sent
+        # once, however many nodes share it
+        if pending_entities:
+            pending_hashes = []
+            misses = {}
+            for node in pending_entities:
+                content_hash = compute_content_hash(node["title"], node["content"])
+                pending_hashes.append(content_hash)
+                cached = cache.get("entities", {}).get(content_hash)
+                if cached is None:
+                    cached = migrate_cache_entry(
+                        cache, "entities", content_hash, *compute_legacy_content_hashes(node["content"]),
+                        title=node["title"]
+                    )
+                if cached is None and content_hash not in misses:
+                    misses[content_hash] = (node["title"], node["content"], content_hash)
+
+            if misses and use_batch_api:
+                print(f"  Classifying {len(misses)} uncached entities with the OpenAI Batch API")
+                entity_results = classify_entities_batch_api(list(misses.values()), api_key, cache)
+            elif misses:
+                print(f"  Classifying {len(misses)} uncached entities")
+                entity_results = classify_entities_llm(list(misses.values()), api_key, cache)
+            if misses and len(entity_results) < len(misses):
+                complete = False
+
+            for node, content_hash in zip(pending_entities, pending_hashes):
+                cached = cache.get("entities", {}).get(content_hash)
+                stated = cached.get("alignment") if cached else None
+                if stated:
+                    llm_count += 1
+                    node["_stated_alignment"] = stated
+                    classified_count += 1
+
+        # Save entity results before starting on relationships
+        if pending_entities:
+            save_cache(cache, cache_path)
+
+        print(f"Stage 1-2 complete:")
+        print(f"  - Eligible nodes: {eligible_count}")
+        print(f"  - Skipped (wrong collection): {skipped_count}")
+        print(f"  - Explicit alignments found: {explicit_count}")
+        print(f"  - LLM classifications: {llm_count}")
+        print(f"  - Total classified: {classified_count}")
+
+        # Stage 2b: Classify relationships
+        # Extract link context from source documents
+        relationship_count = 0
+        links_processed = 0
+        links_with_context = 0
+
+        print(f"\nStage 2b: Classifying relationships ({len(links)} total links)")
 
-    # Stage 2b: Classify relationships
-    # Extract link context from source documents
-    relationship_count = 0
-    links_processed = 0
-    links_with_context = 0
+        if api_key:
+            # First pass: resolve cache hits and collect uncached relationships
+            pending = []
+            pending_links = {}
+            lowered_content = {}
 
-    print(f"\nStage 2b: Classifying relationships ({len(links)} total links)")
+            for link in links:
+                links_processed += 1
+                if links_processed % 100 == 0:
+                    print(f"  Progress: {links_processed}/{len(links)} links processed, {relationship_count} relationships classified")
 
-    if api_key:
-        for link in links:
-            links_processed += 1
-            if links_processed % 100 == 0:
-                print(f"  Progress: {links_processed}/{len(links)} links processed, {relationship_count} relationships classified")
+                source_id = link.get("source") if isinstance(link.get("source"), str) else link.get("source", {}).get("id")
+                target_id = link.get("target") if isinstance(link.get("target"), str) else link.get("target", {}).get("id")
 
-            source_id = link.get("source") if isinstance(link.get("source"), str) else link.get("source", {}).get("id")
-            target_id = link.get("target") if isinstance(link.get("target"), str) else link.get("target", {}).get("id")
+                source_node = node_map.get(source_id)
+                target_node = node_map.get(target_id)
 
-            source_node = node_map.get(source_id)
-            target_node = node_map.get(target_id)
+                if not source_node or not target_node:
+                    continue
 
-            if not source_node or not target_node:
-                continue
+                # Only classify relationships involving alignment entities
+                if source_node.get("collectionId") not in alignment_collection_ids:
+                    continue
 
-            # Only classify relationships involving alignment entities
-            if source_node.get("collectionId") not in alignment_collection_ids:
-                continue
+                # Extract context around the link mention
+                content = source_node.get("content", "")
+                target_title = target_node.get("title", "")
 
-            # Extract context around the link mention
-            content = source_node.get("content", "")
-            target_title = target_node.get("title", "")
-
-            # Find context around mention of target
-            context = extract_link_context(content, target_title)
-
-            if context:
-                links_with_context += 1
-                rel = classify_relationship_llm(
-                    source_node.get("title", ""),
-                    target_title,
-                    context,
-                    api_key,
-                    cache,
-                    cache_path
-                )
+                # Lowercase each source's content once for all of its links
+                if source_id not in lowered_content:
+                    lowered_content[source_id] = lowercase_for_search(content)
 
-                if rel:
-                    rel["source_id"] = source_id
-                    rel["target_id"] = target_id
-                    link["relationship"] = rel
-                    relationship_count += 1
+                # Find context around mention of target
+                context = extract_link_context(
+                    content, target_title, content_lower=lowered_content[source_id]
+                )
 
-        print(f"Stage 2b complete:")
-        print(f"  - Links processed: {links_processed}")
-        print(f"  - Links with context found: {links_with_context}")
-        print(f"  - Relationships classified: {relationship_count}")
-    else:
-        print("  Skipping relationship classification (no API key)")
+                if context:
+                    links_with_context += 1
+                    source_title = source_node.get("title", "")
+                    rel_hash = compute_relationship_hash(source_title, target_title, context)
+
+                    cached = cache.get("relationships", {}).get(rel_hash)
+                    if cached is None:
+                        cached = migrate_cache_entry(
+                            cache, "relationships", rel_hash,
+                            compute_legacy_relationship_hash(source_title, target_title, context)
+                        )
+                    if cached is not None and (cached.get("result") or {}).get("source") == "rule":
+                        # Keyword results are no longer cached; drop ones
+                        # written by older, looser rules and classify again
+                        del cache["relationships"][rel_hash]
+                        cached = None
+                    if cached is not None:
+                        rel = cached.get("result")
+                        if rel:
+                            rel["source_id"] = source_id
+                            rel["target_id"] = target_id
+                            link["relationship"] = rel
+                            relationship_count += 1
+                        continue
+
+                    if rel_hash not in pending_links:
+                        pending.append((source_title, target_title, context, rel_hash))
+                    pending_links.setdefault(rel_hash, []).append((link, source_id, target_id))
+
+            # Second pass: classify cache misses several relationships per request
+            if pending:
+                print(f"  Classifying {len(pending)} uncached relationships in batches of {RELATIONSHIP_BATCH_SIZE}")
+                results = classify_relationships_batch(pending, api_key, cache)
+                if len(results) < len(pending):
+                    complete = False
+
+                for rel_hash, rel in results.items():
+                    for link, source_id, target_id in pending_links[rel_hash]:
+                        rel["source_id"] = source_id
+                        rel["target_id"] = target_id
+                        link["relationship"] = rel
+                        relationship_count += 1
+
+            print(f"Stage 2b complete:")
+            print(f"  - Links processed: {links_processed}")
+            print(f"  - Links with context found: {links_with_context}")
+            print(f"  - Relationships classified: {relationship_count}")
+        else:
+            print("  Skipping relationship classification (no API key)")
+    finally:
+        # Save new LLM results, even if classification was interrupted
+        save_cache(cache, cache_path)
 
     # Stage 3: Calculate behavioral alignment
     # First pass: collect all stated alignments for target lookup
     target_alignments = {}
-    for node in nodes:
+    for node in eligible_nodes:
         if node.get("_stated_alignment"):
             target_alignments[node["id"]] = {
                 "final": node["_stated_alignment"]
             }
 
-    for node in nodes:
-        if node.get("alignment") is None and node.get("_stated_alignment") is None:
-            continue
+    # Index links once for Stage 3 and Stage 4
+    adjacency = build_adjacency(links)
+    relationships_by_source = {}
+    for link in links:
+        if link.get("relationship"):
+            source_id = link.get("source") if isinstance(link.get("source"), str) else link.get("source", {}).get("id")
+            relationships_by_source.setdefault(source_id, []).append(link["relationship"])
 
-        if node.get("collectionId") not in alignment_collection_ids:
+    for node in eligible_nodes:
+        if node.get("alignment") is None and node.get("_stated_alignment") is None:
             continue
 
         stated = node.get("_stated_alignment")
 
         # Gather relationships where this node is the source
-        node_relationships = []
-        for link in links:
-            source_id = link.get("source") if isinstance(link.get("source"), str) else link.get("source", {}).get("id")
-            if source_id == node["id"] and link.get("relationship"):
-                node_relationships.append(link["relationship"])
+        node_relationships = relationships_by_source.get(node["id"], [])
 
         # Calculate behavioral alignment
         behavioral = calculate_behavioral_alignment(stated, node_relationships, target_alignments)
@@ -688,56 +1247,95 @@ def classify_alignments(
             del node["_stated_alignment"]
 
     # Clean up any remaining temporary fields
-    for node in nodes:
+    for node in eligible_nodes:
         if "_stated_alignment" in node:
             del node["_stated_alignment"]
 
     # Stage 4: Propagate to unclassified entities
-    propagate_alignments(nodes, links)
-
-    # Save final cache state
-    save_cache(cache, cache_path)
+    propagate_alignments(nodes, links, node_map=node_map, adjacency=adjacency)
 
     # Summary
     with_alignment = sum(1 for n in nodes if n.get("alignment") is not None)
     print(f"Alignment classification complete: {with_alignment}/{len(nodes)} nodes have alignment data")
+    if not complete:
+        print("  Some LLM classifications failed; they will be retried on the next run")
+
+    return complete
+
+
+def lowercase_for_search(content: str) -> Optional[str]:
+    """
+    Lowercase content for case-insensitive substring search with str.find.
+
+    Returns None when offsets in the lowercased text wouldn't line up with the
+    original, or when it contains the few characters re.IGNORECASE folds to
+    ASCII letters differently than str.lower().
+    """
+    content_lower = content.lower()
+    if len(content_lower) != len(content) or "\u0131" in content or "\u017f" in content:
+        return None
+    return content_lower
 
 
-def extract_link_context(content: str, target_title: str, context_chars: int = 200) -> Optional[str]:
+def extract_link_context(
+    content: str,
+    target_title: str,
+    context_chars: int = 200,
+    content_lower: Optional[str] = None
+) -> Optional[str]:
     """
     Extract the context around a mention of the target entity in the content.
 
+    Callers looking up many targets in the same content can pass
+    content_lower (from lowercase_for_search, computed once) to search it with
+    plain substring matching instead of a case-insensitive regex per target.
+
     Returns the sentence or surrounding text where the target is mentioned.
     """
     if not content or not target_title:
         return None
 
-    # Try to find the target title in the content
-    # Handle both exact matches and partial matches
-    pattern = re.escape(target_title)
-    match = re.search(pattern, content, re.IGNORECASE)
-
     # Get first word for fallback matching
     first_word = target_title.split()[0] if ' ' in target_title else target_title
 
-    if not match:
-        # Try with just the first word if title is multiple words
-        if len(first_word) > 3:
-            match = re.search(re.escape(first_word), content, re.IGNORECASE)
+    if content_lower is not None and target_title.isascii():
+        # Matches re.IGNORECASE exactly for ASCII titles
+        match_start = content_lower.find(target_title.lower())
+        match_end = match_start + len(target_title)
 
-    if not match:
-        return None
+        if match_start == -1 and len(first_word) > 3:
+            match_start = content_lower.find(first_word.lower())
+            match_end = match_start + len(first_word)
+
+        if match_start == -1:
+            return None
+    else:
+        # Try to find the target title in the content
+        # Handle both exact matches and partial matches
+        match = re.search(re.escape(target_title), content, re.IGNORECASE)
+
+        if not match:
+            # Try with just the first word if title is multiple words
+            if len(first_word) > 3:
+                match = re.search(re.escape(first_word), content, re.IGNORECASE)
+
+        if not match:
+            return None
+
+        match_start, match_end = match.start(), match.end()
 
     # Extract surrounding context
-    start = max(0, match.start() - context_chars)
-    end = min(len(content), match.end() + context_chars)
+    start = max(0, match_start - context_chars)
+    end = min(len(content), match_end + context_chars)
 
     context = content[start:end]
 
     # Try to find sentence boundaries
-    sentences = re.split(r'[.!?]\s+', context)
-    for sentence in sentences:
-        if target_title.lower() in sentence.lower() or (len(first_word) > 3 and first_word.lower() in sentence.lower()):
+    title_lower = target_title.lower()
+    first_word_lower = first_word.lower() if len(first_word) > 3 else None
+    for sentence in _SENTENCE_BREAK_RE.split(context):
+        sentence_lower = sentence.lower()
+        if title_lower in sentence_lower or (first_word_lower and first_word_lower in sentence_lower):
             return sentence.strip()
 
     return context.strip()
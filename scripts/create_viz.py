@@ -6,66 +6,75 @@ and generates visualization files in the docs directory using templates
 from the static directory.
 """
 
-import json
 import os
+import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def create_visualization():
     """
     Create a D3.js network visualization from the graph data.
     Uses templates from the static directory and outputs to the docs directory.
     """
-    # Create docs directory if it doesn't exist
+    # Create the docs, docs/js and docs/css directories if they don't exist
     docs_dir = Path("docs")
-    docs_dir.mkdir(exist_ok=True)
-    
-    # Read the graph data
-    with open("data/graph_data.json", "r", encoding="utf-8") as f:
-        graph_data = json.load(f)
-    
-    # Create the graph data JavaScript file
-    graph_data_js = f"// Graph data from JSON\nconst graphData = {json.dumps(graph_data, indent=2)};"
-    
-    # Create the docs/js directory if it doesn't exist
     docs_js_dir = docs_dir / "js"
-    docs_js_dir.mkdir(exist_ok=True)
-    
-    # Write the graph data JavaScript file
-    with open(docs_js_dir / "graph-data.js", "w", encoding="utf-8") as f:
-        f.write(graph_data_js)
-    
-    # Create the docs/css directory if it doesn't exist
     docs_css_dir = docs_dir / "css"
-    docs_css_dir.mkdir(exist_ok=True)
-    
-    # Copy static files to docs directory
-    # Copy CSS
-    shutil.copy("static/css/styles.css", docs_css_dir / "styles.css")
-    
-    # Copy collection colors CSS if it exists
-    collection_colors_css = Path("static/css/collection-colors.css")
-    if collection_colors_css.exists():
-        shutil.copy(collection_colors_css, docs_css_dir / "collection-colors.css")
-        print("Collection colors CSS copied to docs/css/collection-colors.css")
-
-    # Copy alignment mode CSS if it exists
-    alignment_mode_css = Path("static/css/alignment-mode.css")
-    if alignment_mode_css.exists():
-        shutil.copy(alignment_mode_css, docs_css_dir / "alignment-mode.css")
-        print("Alignment mode CSS copied to docs/css/alignment-mode.css")
+    docs_js_dir.mkdir(parents=True, exist_ok=True)
+    docs_css_dir.mkdir(parents=True, exist_ok=True)
     
-    # Copy visualization.js
-    shutil.copy("static/js/visualization.js", docs_js_dir / "visualization.js")
+    # Copy static files to docs directory as (source, destination, optional)
+    static_files = [
+        (Path("static/css/styles.css"), docs_css_dir / "styles.css", False),
+        (Path("static/css/collection-colors.css"), docs_css_dir / "collection-colors.css", True),
+        (Path("static/css/alignment-mode.css"), docs_css_dir / "alignment-mode.css", True),
+        (Path("static/js/visualization.js"), docs_js_dir / "visualization.js", False),
+        (Path("static/js/forces.js"), docs_js_dir / "forces.js", False),
+        (Path("static/js/sim-worker.js"), docs_js_dir / "sim-worker.js", False),
+        (Path("static/js/collection-colors.js"), docs_js_dir / "collection-colors.js", True),
+        (Path("static/index.html"), docs_dir / "index.html", False),
+    ]
     
-    # Copy collection colors JS if it exists
-    collection_colors_js = Path("static/js/collection-colors.js")
-    if collection_colors_js.exists():
-        shutil.copy(collection_colors_js, docs_js_dir / "collection-colors.js")
-        print("Collection colors JS copied to docs/js/collection-colors.js")
+    # Optional files are only copied if they exist
+    static_files = [(src, dst, optional) for src, dst, optional in static_files
+                    if not optional or src.exists()]
     
-    # Copy index.html
-    shutil.copy("static/index.html", docs_dir / "index.html")
+    # The copies are independent of each other and of the graph data, so run
+    # them in the background while graph-data.js is written
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        copies = [executor.submit(shutil.copyfile, src, dst) for src, dst, _ in static_files]
+        
+        # Read the graph data as raw bytes; JSON is valid JavaScript, so it
+        # is embedded as bytes without a round trip through text
+        graph_data = Path("data/graph_data.json").read_bytes()
+        
+        # Page content is only needed for alignment classification, not by the
+        # visualization, and is most of the file's size, so leave it out
+        graph = orjson.loads(graph_data) if orjson else json.loads(graph_data)
+        for node in graph["nodes"]:
+            node.pop("content", None)
+        if orjson:
+            graph_data = orjson.dumps(graph)
+        else:
+            graph_data = json.dumps(graph, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        
+        # Write the graph data JavaScript file without indentation
+        with open(docs_js_dir / "graph-data.js", "wb") as f:
+            f.write(b"// Graph data from JSON\nconst graphData = ")
+            f.write(graph_data)
+            f.write(b";")
+        
+        # Wait for the copies, surfacing any copy error
+        for (src, dst, optional), copy in zip(static_files, copies):
+            copy.result()
+            if optional:
+                print(f"{src.name} copied to {dst.as_posix()}")
     
     # Create a simple README for the GitHub Pages site
     readme_content = """# Dungeon Church Oracle
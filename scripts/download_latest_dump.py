@@ -1,23 +1,186 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
+import shutil
 import tempfile
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def download_latest_dump():
+# Bytes read from the download stream per write; large reads keep the per-chunk
+# Python overhead negligible next to the transfer itself
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+
+# Number of byte ranges fetched in parallel for large dumps, and the smallest
+# range worth its own request
+DOWNLOAD_PARTS = int(os.environ.get('DOWNLOAD_PARTS', 8))
+MIN_PART_SIZE = 8 * 1024 * 1024
+
+# Ask for the dump as stored, so the raw response body is the file itself and
+# can be copied to disk without going through requests' decoding layer
+IDENTITY_ENCODING = {'Accept-Encoding': 'identity'}
+
+# Outline PostgreSQL dumps in the bucket's backup folder
+_DUMP_RE = re.compile(r'backup/.*-outline-postgres\.dump', re.DOTALL)
+
+# Sidecar in the data directory recording the last dump downloaded, so an
+# unchanged dump that is still on disk isn't downloaded again
+DOWNLOAD_STATE_FILE = ".last_download.json"
+
+def create_session():
     """
-    Download the latest PostgreSQL dump file from OCI S3 compatible storage.
-    Uses environment variables for configuration:
-    - DUNGEONCHURCH_S3_URL: The pre-authenticated request URL for OCI Object Storage
-    - DUNGEONCHURCH_S3_NAMESPACE: The OCI namespace
-    - DUNGEONCHURCH_S3_BUCKET: The OCI bucket name
-    
+    Create a requests session that keeps the connection to the object storage
+    host alive between the listing and download requests, and retries
+    transient failures with backoff.
+
     Returns:
-        str: Path to the downloaded dump file, or None if download failed
+        requests.Session: Configured session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=max(4, DOWNLOAD_PARTS),
+        max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def load_download_state(state_file):
+    """
+    Load the record of the last dump downloaded.
+
+    Args:
+        state_file (str): Path to the download state sidecar
+
+    Returns:
+        dict: The recorded name, etag and file, or an empty dict if there is none
+    """
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return {}
+
+def save_download_state(state_file, name, etag, dump_file):
+    """
+    Record the dump that was just downloaded.
+
+    Args:
+        state_file (str): Path to the download state sidecar
+        name (str): Object name of the dump in the bucket
+        etag (str): ETag the server returned for the dump
+        dump_file (str): Path the dump was saved to
+    """
+    try:
+        with open(state_file, 'w') as f:
+            json.dump({'name': name, 'etag': etag, 'file': dump_file}, f)
+    except IOError as e:
+        print(f"Warning: Could not save download state to {state_file}: {e}")
+
+def download_single_stream(session, download_url, dump_file):
+    """
+    Download a file over one streamed GET request.
+
+    Args:
+        session (requests.Session): Session to download with
+        download_url (str): URL of the file
+        dump_file (str): Path to write the file to
+    """
+    # Stream the body straight to disk so only one chunk is held in memory,
+    # and release the connection back to the pool once the body is consumed
+    with session.get(download_url, headers=IDENTITY_ENCODING, stream=True, timeout=(5, 300)) as download_response:
+        if download_response.status_code != 200:
+            print(f"Error downloading file: {download_response.status_code} - {download_response.text}")
+            sys.exit(1)
+
+        download_response.raw.decode_content = False
+        with open(dump_file, 'wb') as f:
+            shutil.copyfileobj(download_response.raw, f, DOWNLOAD_CHUNK_SIZE)
+
+def preallocate(fd, size):
+    """
+    Size a file to its final length, reserving the disk blocks up front where
+    the platform supports it so they aren't allocated write by write.
+
+    Args:
+        fd (int): File descriptor open for writing
+        size (int): Length of the file in bytes
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # Not supported by this filesystem
+            pass
+    os.ftruncate(fd, size)
+
+def download_in_parts(session, download_url, dump_file, total_size, parts):
+    """
+    Download a file as parallel byte-range requests, each written into place
+    in a file preallocated to the full length.
+
+    Args:
+        session (requests.Session): Session to download with
+        download_url (str): URL of the file
+        dump_file (str): Path to write the file to
+        total_size (int): Size of the file in bytes
+        parts (int): Number of ranges to split the download into
+
+    Returns:
+        bool: True if the file was downloaded, False if the server ignored
+        the range requests and the caller should download it in one stream
+    """
+    part_size = -(-total_size // parts)
+    ranges = [(start, min(start + part_size, total_size) - 1)
+              for start in range(0, total_size, part_size)]
+
+    fd = os.open(dump_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        preallocate(fd, total_size)
+
+        def fetch_range(byte_range):
+            start, end = byte_range
+            headers = {**IDENTITY_ENCODING, 'Range': f'bytes={start}-{end}'}
+            with session.get(download_url, headers=headers, stream=True, timeout=(5, 300)) as response:
+                if response.status_code == 200:
+                    # The server sent the whole file instead of the range
+                    return False
+                if response.status_code != 206:
+                    raise IOError(f"Error downloading bytes {start}-{end}: {response.status_code}")
+
+                response.raw.decode_content = False
+                offset = start
+                while True:
+                    chunk = response.raw.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+
+                if offset != end + 1:
+                    raise IOError(f"Incomplete download of bytes {start}-{end}: got {offset - start} bytes")
+                return True
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            return all(list(executor.map(fetch_range, ranges)))
+    finally:
+        os.close(fd)
+
+def get_storage_url():
+    """
+    Read the object storage configuration from the environment, exiting if
+    any of it is missing.
+
+    Returns:
+        str: The pre-authenticated request URL for the bucket
     """
-    # Get environment variables
     s3_url = os.environ.get('DUNGEONCHURCH_S3_URL')
     namespace = os.environ.get('DUNGEONCHURCH_S3_NAMESPACE')
     bucket = os.environ.get('DUNGEONCHURCH_S3_BUCKET')
@@ -30,78 +193,201 @@ def download_latest_dump():
     print(f"Using pre-authenticated request URL: {s3_url}")
     print(f"Namespace: {namespace}")
     print(f"Bucket: {bucket}")
+    return s3_url
+
+def find_latest_dump(session, s3_url):
+    """
+    List the bucket's backup folder and find the newest PostgreSQL dump.
+
+    Args:
+        session (requests.Session): Session to list the bucket with
+        s3_url (str): The pre-authenticated request URL for the bucket
+
+    Returns:
+        dict: The latest dump's object 'name', and its 'size' in bytes, or
+        None if the listing didn't report it
+    """
+    # List objects in the bucket using the pre-authenticated request URL
+    # The URL already returns a JSON response with the list of objects
+    print(f"Listing objects from: {s3_url}")
+
+    # Let the server filter to the backup folder, and follow nextStartWith
+    # so buckets with more objects than one listing page are fully scanned.
+    # Sizes come with the listing, so finding the dump needs no HEAD request
+    params = {'prefix': 'backup/', 'fields': 'name,size'}
+    latest_dump = None
 
     try:
-        # List objects in the bucket using the pre-authenticated request URL
-        # The URL already returns a JSON response with the list of objects
-        print(f"Listing objects from: {s3_url}")
-        
-        response = requests.get(s3_url)
-        if response.status_code != 200:
-            print(f"Error listing objects: {response.status_code} - {response.text}")
-            sys.exit(1)
-            
-        # Parse the JSON response
-        try:
+        while True:
+            response = session.get(s3_url, params=params, timeout=(5, 30))
+            if response.status_code != 200:
+                print(f"Error listing objects: {response.status_code} - {response.text}")
+                sys.exit(1)
+
+            # Parse the JSON response
             data = response.json()
-            
-            # Filter for PostgreSQL dump files in the backup folder
-            dump_files = []
+
+            # Keep the newest PostgreSQL dump file in the backup folder.
+            # Names include the date in the format YYYY-MM-DD-HH-MM-SS,
+            # so the newest is the greatest name as a string
             for obj in data.get('objects', []):
                 name = obj.get('name', '')
-                if name.endswith('-outline-postgres.dump') and name.startswith('backup/'):
-                    dump_files.append(name)
+                if _DUMP_RE.fullmatch(name):
                     print(f"Found dump file: {name}")
-            
-            if not dump_files:
-                print("No PostgreSQL dump files found with pattern *-outline-postgres.dump")
-                sys.exit(1)
-            
-            # Sort by name (which includes the date in the format YYYY-MM-DD-HH-MM-SS)
-            # This works because the date format is sortable as a string
-            latest_dump = sorted(dump_files)[-1]
-            
-            print(f"Found latest dump file: {latest_dump}")
-            
-            # Create a data directory if it doesn't exist
-            data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
-            os.makedirs(data_dir, exist_ok=True)
-            
-            # Use a more descriptive filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            dump_file = os.path.join(data_dir, f"outline_postgres_{timestamp}.dump")
-            
-            print(f"Downloading to file: {dump_file}")
-            
-            # Download the file using the pre-authenticated request
-            # Remove the leading slash to avoid double slashes in the URL
-            download_url = f"{s3_url}{latest_dump}"
-            print(f"Downloading from: {download_url}")
-            
-            download_response = requests.get(download_url, stream=True)
-            if download_response.status_code != 200:
-                print(f"Error downloading file: {download_response.status_code} - {download_response.text}")
+                    if latest_dump is None or name > latest_dump['name']:
+                        latest_dump = {'name': name, 'size': obj.get('size')}
+
+            next_start = data.get('nextStartWith')
+            if not next_start:
+                break
+            params['start'] = next_start
+    except json.JSONDecodeError:
+        print("Error: Failed to parse JSON response from S3")
+        print(f"Response content: {response.text[:200]}...")  # Print first 200 chars for debugging
+        sys.exit(1)
+
+    if latest_dump is None:
+        print("No PostgreSQL dump files found with pattern *-outline-postgres.dump")
+        sys.exit(1)
+
+    print(f"Found latest dump file: {latest_dump['name']}")
+    return latest_dump
+
+def locate_latest_dump():
+    """
+    Find the latest PostgreSQL dump without downloading it, so callers can
+    decide how to fetch it and pass the result on without listing the
+    bucket again. Uses the same environment variables as download_latest_dump.
+
+    Returns:
+        dict: The latest dump's object 'name' and 'size', as from find_latest_dump
+    """
+    s3_url = get_storage_url()
+    session = create_session()
+
+    try:
+        return find_latest_dump(session, s3_url)
+    finally:
+        session.close()
+
+@contextmanager
+def open_latest_dump_stream(latest_dump=None):
+    """
+    Open the latest PostgreSQL dump as a byte stream straight from object
+    storage, so it can be piped into pg_restore without being saved to disk.
+    Uses the same environment variables as download_latest_dump.
+
+    Args:
+        latest_dump (dict, optional): The dump from locate_latest_dump. If
+            None, the bucket is listed to find it.
+
+    Yields:
+        tuple: (object name of the dump, file-like object of the raw dump bytes)
+    """
+    s3_url = get_storage_url()
+    session = create_session()
+
+    try:
+        if latest_dump is None:
+            latest_dump = find_latest_dump(session, s3_url)
+        latest_dump = latest_dump['name']
+        download_url = f"{s3_url}{latest_dump}"
+        print(f"Streaming from: {download_url}")
+
+        with session.get(download_url, headers=IDENTITY_ENCODING, stream=True, timeout=(5, 300)) as response:
+            if response.status_code != 200:
+                print(f"Error downloading file: {response.status_code} - {response.text}")
                 sys.exit(1)
-                
-            # Save the file
-            with open(dump_file, 'wb') as f:
-                for chunk in download_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"Download complete. File saved to {dump_file}")
-            print(f"File size: {os.path.getsize(dump_file)} bytes")
-            
-            # Return the path to the downloaded file instead of deleting it
-            return dump_file
-            
-        except json.JSONDecodeError:
-            print("Error: Failed to parse JSON response from S3")
-            print(f"Response content: {response.text[:200]}...")  # Print first 200 chars for debugging
-            sys.exit(1)
-            
+
+            response.raw.decode_content = False
+            yield latest_dump, response.raw
+    finally:
+        session.close()
+
+def download_latest_dump(latest_dump=None):
+    """
+    Download the latest PostgreSQL dump file from OCI S3 compatible storage.
+    Uses environment variables for configuration:
+    - DUNGEONCHURCH_S3_URL: The pre-authenticated request URL for OCI Object Storage
+    - DUNGEONCHURCH_S3_NAMESPACE: The OCI namespace
+    - DUNGEONCHURCH_S3_BUCKET: The OCI bucket name
+    
+    Args:
+        latest_dump (dict, optional): The dump from locate_latest_dump. If
+            None, the bucket is listed to find it.
+    
+    Returns:
+        str: Path to the downloaded dump file, or None if download failed
+    """
+    s3_url = get_storage_url()
+
+    session = create_session()
+
+    try:
+        if latest_dump is None:
+            latest_dump = find_latest_dump(session, s3_url)
+        latest_dump = latest_dump['name']
+
+        # Create a data directory if it doesn't exist
+        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+        os.makedirs(data_dir, exist_ok=True)
+        
+        # Use a more descriptive filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        dump_file = os.path.join(data_dir, f"outline_postgres_{timestamp}.dump")
+        
+        # Download the file using the pre-authenticated request
+        # Remove the leading slash to avoid double slashes in the URL
+        download_url = f"{s3_url}{latest_dump}"
+        print(f"Downloading from: {download_url}")
+        
+        # Large dumps are fetched as parallel byte ranges when the server
+        # supports them, so the transfer isn't limited to one TCP stream
+        head = session.head(download_url, timeout=(5, 30))
+        total_size = int(head.headers.get('Content-Length', 0)) if head.status_code == 200 else 0
+        accepts_ranges = head.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        parts = min(DOWNLOAD_PARTS, total_size // MIN_PART_SIZE) if accepts_ranges else 0
+        etag = head.headers.get('ETag') if head.status_code == 200 else None
+        
+        # Reuse the previous download if it is the same object and still on disk
+        state_file = os.path.join(data_dir, DOWNLOAD_STATE_FILE)
+        previous = load_download_state(state_file)
+        if (etag and previous.get('name') == latest_dump and previous.get('etag') == etag
+                and os.path.exists(previous.get('file', ''))):
+            print(f"Dump unchanged since last download, reusing {previous['file']}")
+            return previous['file']
+
+        print(f"Downloading to file: {dump_file}")
+        
+        # Save the file, removing it again if the transfer fails part-way
+        # so a truncated dump isn't left in the data directory
+        try:
+            if parts > 1:
+                print(f"Downloading {total_size} bytes in {parts} parts")
+                if not download_in_parts(session, download_url, dump_file, total_size, parts):
+                    print("Server ignored range requests, downloading in one stream")
+                    download_single_stream(session, download_url, dump_file)
+            else:
+                download_single_stream(session, download_url, dump_file)
+        except BaseException:
+            if os.path.exists(dump_file):
+                os.remove(dump_file)
+            raise
+        
+        if etag:
+            save_download_state(state_file, latest_dump, etag, dump_file)
+        
+        print(f"Download complete. File saved to {dump_file}")
+        print(f"File size: {os.path.getsize(dump_file)} bytes")
+        
+        # Return the path to the downloaded file instead of deleting it
+        return dump_file
+
     except Exception as e:
         print(f"Error: {str(e)}")
         return None
+    finally:
+        session.close()
 
 if __name__ == "__main__":
     dump_file = download_latest_dump()
@@ -9,7 +9,6 @@ import os
 import sys
 import json
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import argparse
 from pathlib import Path
 
@@ -38,40 +37,32 @@ def extract_collection_colors(db_name):
             password=pg_password,
             dbname=db_name
         )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         
         # Extract collections with their colors
         print("Extracting collection colors")
         
-        # Query to get collections and their colors
-        # Note: The actual column name for color might be different
-        # Adjust the query based on the actual schema
+        # Query to get collections and their colors, ensuring set colors are
+        # valid hex codes. Unset colors are left empty so the visualization
+        # falls back to its own palette for them
         cursor.execute("""
-        SELECT id, name, color
+        SELECT id, name,
+               CASE WHEN color IS NULL OR color = '' OR color LIKE '#%' THEN color
+                    ELSE '#' || color
+               END AS color
         FROM collections
         WHERE "deletedAt" IS NULL;
         """)
         
-        collections = cursor.fetchall()
+        # Create a dictionary mapping collection IDs to colors
+        collection_colors = {
+            collection_id: {'name': name, 'color': color}
+            for collection_id, name, color in cursor
+        }
         
         cursor.close()
         conn.close()
         
-        # Create a dictionary mapping collection IDs to colors
-        collection_colors = {}
-        for collection in collections:
-            # If color is not set, use a default color
-            color = collection.get('color', '#69b3a2')
-            
-            # Ensure color is a valid hex code
-            if color and not color.startswith('#'):
-                color = f"#{color}"
-                
-            collection_colors[collection['id']] = {
-                'name': collection['name'],
-                'color': color
-            }
-        
         print(f"Extracted colors for {len(collection_colors)} collections")
         return collection_colors
         
@@ -94,26 +85,30 @@ def generate_css(collection_colors, output_file):
         # Create the directory if it doesn't exist
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        # Generate CSS content
-        css_content = "/* Auto-generated collection colors */\n\n"
+        # Generate CSS content as a list of parts joined once at the end
+        css_parts = ["/* Auto-generated collection colors */\n\n"]
         
         # Add CSS variables for each collection
-        css_content += ":root {\n"
-        for collection_id, data in collection_colors.items():
-            css_content += f"    --collection-{collection_id}: {data['color']};\n"
-        css_content += "}\n\n"
+        css_parts.append(":root {\n")
+        css_parts.extend(
+            f"    --collection-{collection_id}: {data['color']};\n"
+            for collection_id, data in collection_colors.items()
+        )
+        css_parts.append("}\n\n")
         
         # Add classes for each collection
-        for collection_id, data in collection_colors.items():
-            css_content += f"/* {data['name']} */\n"
-            css_content += f".collection-{collection_id} {{\n"
-            css_content += f"    fill: {data['color']};\n"
-            css_content += f"    color: {data['color']};\n"
-            css_content += "}\n\n"
+        css_parts.extend(
+            f"/* {data['name']} */\n"
+            f".collection-{collection_id} {{\n"
+            f"    fill: {data['color']};\n"
+            f"    color: {data['color']};\n"
+            "}\n\n"
+            for collection_id, data in collection_colors.items()
+        )
         
         # Write the CSS file
         with open(output_file, 'w') as f:
-            f.write(css_content)
+            f.write("".join(css_parts))
         
         print(f"CSS file generated successfully: {output_file}")
         return True
@@ -141,12 +136,14 @@ def generate_js_colors(collection_colors, output_file):
         colors_dict = {collection_id: data['color'] for collection_id, data in collection_colors.items()}
         
         # Generate JavaScript content
-        js_content = "// Auto-generated collection colors\n\n"
-        js_content += "const collectionColors = " + json.dumps(colors_dict, indent=2) + ";\n\n"
-        js_content += "// Function to get color for a collection\n"
-        js_content += "function getCollectionColor(collectionId) {\n"
-        js_content += "    return collectionColors[collectionId] || '#69b3a2';\n"
-        js_content += "}\n"
+        js_content = "".join([
+            "// Auto-generated collection colors\n\n",
+            "const collectionColors = ", json.dumps(colors_dict, indent=2), ";\n\n",
+            "// Function to get color for a collection\n",
+            "function getCollectionColor(collectionId) {\n",
+            "    return collectionColors[collectionId] || '#69b3a2';\n",
+            "}\n",
+        ])
         
         # Write the JavaScript file
         with open(output_file, 'w') as f:
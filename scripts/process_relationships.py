@@ -1,27 +1,177 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import json
+import hashlib
 import subprocess
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
 import tempfile
 import shutil
 import argparse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-def restore_database(dump_file):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tables the pipeline reads rows from. Only their data is restored from the
+# dump; every other table is still created, but left empty
+RESTORE_TABLES = {"documents", "relationships", "collections"}
+
+# Parallel pg_restore jobs for dump files. Needs a custom or directory format
+# dump, which the Outline backups are, and can't be combined with
+# --single-transaction
+PG_RESTORE_JOBS = int(os.environ.get("PG_RESTORE_JOBS", os.cpu_count() or 1))
+
+# Session settings for the pg_restore connections. The temporary database is
+# dropped at the end of the run, so commits don't need to wait for a WAL
+# flush, and index builds get more memory than the server default
+PG_RESTORE_OPTIONS = os.environ.get(
+    "PG_RESTORE_OPTIONS", "-c synchronous_commit=off -c maintenance_work_mem=512MB"
+)
+
+# Table data entry in a pg_restore TOC listing, e.g.
+# "3533; 0 16423 TABLE DATA public documents outline"
+_TABLE_DATA_RE = re.compile(r'^\d+; \d+ \d+ TABLE DATA \S+ (\S+) ')
+
+# Foreign key entry in a pg_restore TOC listing, e.g.
+# "4005; 2606 17003 FK CONSTRAINT public documents documents_collectionId_fkey outline"
+_FK_CONSTRAINT_RE = re.compile(r'^\d+; \d+ \d+ FK CONSTRAINT ')
+
+# Graph nodes, including document text for alignment classification.
+# Documents in the excluded collections are left out by the database
+GRAPH_NODES_QUERY = """
+SELECT id, title, "urlId", "collectionId", "createdAt",
+       COALESCE(text, '') as content
+FROM   documents
+WHERE  "deletedAt" IS NULL
+AND    ("collectionId" IS NULL OR "collectionId" != ALL(%(excluded)s::uuid[]))
+"""
+
+# Graph edges with additional metadata, limited to links whose source and
+# target are both graph nodes
+GRAPH_EDGES_QUERY = """
+SELECT r."reverseDocumentId" AS source,
+       r."documentId"        AS target,
+       r."createdAt"         AS creation_time,
+       CASE WHEN EXISTS (
+         SELECT 1 FROM relationships r2 
+         WHERE r2."documentId" = r."reverseDocumentId" 
+         AND r2."reverseDocumentId" = r."documentId"
+         AND r2.type = 'backlink'
+       ) THEN 'bidirectional' ELSE 'unidirectional' END as direction
+FROM   relationships r
+JOIN   documents ds ON ds.id = r."reverseDocumentId"
+JOIN   documents dt ON dt.id = r."documentId"
+WHERE  r.type = 'backlink'
+AND    ds."deletedAt" IS NULL
+AND    dt."deletedAt" IS NULL
+AND    (ds."collectionId" IS NULL OR ds."collectionId" != ALL(%(excluded)s::uuid[]))
+AND    (dt."collectionId" IS NULL OR dt."collectionId" != ALL(%(excluded)s::uuid[]))
+"""
+
+def write_restore_list(dump_file, list_file, pg_env):
     """
-    Restore the PostgreSQL dump file to a temporary database.
+    Write a pg_restore TOC list for the dump that keeps every schema entry
+    but only the table data for RESTORE_TABLES, so pg_restore -L skips
+    loading rows the pipeline never reads (revisions, events, ...).
+    
+    Foreign keys are skipped too. Most point at tables restored empty
+    (users, teams, ...), so validating them would only scan the restored
+    rows and fail, and the pipeline never relies on them.
     
     Args:
         dump_file (str): Path to the PostgreSQL dump file
+        list_file (str): Path to write the TOC list to
+        pg_env (dict): Environment for the pg_restore subprocess
+        
+    Returns:
+        tuple: (table data entries skipped, foreign key entries skipped)
+    """
+    toc = subprocess.run(
+        ["pg_restore", "-l", dump_file],
+        capture_output=True, text=True, check=True, env=pg_env
+    )
+    
+    skipped = 0
+    skipped_fks = 0
+    with open(list_file, 'w') as f:
+        for line in toc.stdout.splitlines():
+            # Lines starting with ';' are ignored by pg_restore -L
+            match = _TABLE_DATA_RE.match(line)
+            if match and match.group(1) not in RESTORE_TABLES:
+                f.write(f";{line}\n")
+                skipped += 1
+            elif _FK_CONSTRAINT_RE.match(line):
+                f.write(f";{line}\n")
+                skipped_fks += 1
+            else:
+                f.write(f"{line}\n")
+    return skipped, skipped_fks
+
+def stream_restore(dump_stream, command, pg_env):
+    """
+    Run pg_restore with the dump piped to its stdin.
+
+    Args:
+        dump_stream (file-like): Raw dump bytes
+        command (list): pg_restore command line, without a dump file argument
+        pg_env (dict): Environment for pg_restore
+
+    Returns:
+        subprocess.CompletedProcess: The finished process with its stderr as text
+    """
+    # stderr goes to a temporary file rather than a pipe, so pg_restore can't
+    # block on a full stderr pipe while we are still writing to its stdin
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=stderr_file, env=pg_env)
+        try:
+            shutil.copyfileobj(dump_stream, proc.stdin, 1024 * 1024)
+        except BrokenPipeError:
+            # pg_restore exited early; its stderr says why
+            pass
+        except BaseException:
+            # The download failed or was interrupted; don't leave pg_restore
+            # running on a half-written dump
+            proc.kill()
+            raise
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+
+    return subprocess.CompletedProcess(command, returncode, stderr=stderr)
+
+def restore_database(dump_file, dump_stream=None):
+    """
+    Restore the PostgreSQL dump file to a temporary database.
+    
+    Args:
+        dump_file (str): Path to the PostgreSQL dump file, or the dump's object
+            name when dump_stream is given
+        dump_stream (file-like, optional): Raw dump bytes to pipe into
+            pg_restore instead of reading dump_file from disk
         
     Returns:
         str: Name of the temporary database, or None if restoration failed
     """
+    temp_db_created = False
     try:
-        # Create a temporary database name
-        temp_db_name = f"outline_temp_{os.path.basename(dump_file).split('.')[0]}"
+        # Create a temporary database name from a hash of the whole dump path
+        # and a per-run id, so neither dumps whose names only differ after the
+        # first "." nor two runs on the same dump collide
+        run_key = f"{dump_file}:{uuid.uuid4().hex}"
+        dump_hash = hashlib.blake2b(run_key.encode('utf-8'), digest_size=6).hexdigest()
+        temp_db_name = f"outline_temp_{dump_hash}"
         
         print(f"Creating temporary database: {temp_db_name}")
         
@@ -34,28 +184,61 @@ def restore_database(dump_file):
         # Set PGPASSWORD environment variable for command-line tools
         pg_env = os.environ.copy()
         pg_env["PGPASSWORD"] = pg_password
+        pg_env["PGOPTIONS"] = f"{pg_env.get('PGOPTIONS', '')} {PG_RESTORE_OPTIONS}".strip()
         
-        # Create the database
-        subprocess.run([
-            "createdb",
-            "-h", pg_host,
-            "-p", pg_port,
-            "-U", pg_user,
-            temp_db_name
-        ], check=True, env=pg_env)
-        
-        # Restore the dump file to the temporary database
-        print(f"Restoring dump file to database: {temp_db_name}")
-        result = subprocess.run([
-            "pg_restore",
-            "-h", pg_host,
-            "-p", pg_port,
-            "-U", pg_user,
-            "-d", temp_db_name,
-            "--no-owner",  # Skip ownership commands
-            "--no-privileges",  # Skip privilege commands
-            dump_file
-        ], capture_output=True, text=True, env=pg_env)
+        # Create the database over the maintenance database rather than
+        # spawning createdb. CREATE DATABASE can't run inside a transaction
+        admin_conn = psycopg2.connect(
+            host=pg_host,
+            port=pg_port,
+            user=pg_user,
+            password=pg_password,
+            dbname="postgres"
+        )
+        try:
+            admin_conn.autocommit = True
+            with admin_conn.cursor() as cursor:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(temp_db_name)))
+        finally:
+            admin_conn.close()
+        temp_db_created = True
+        
+        if dump_stream is not None:
+            # pg_restore reads the dump from stdin as it arrives. A pipe can't
+            # be seeked, so parallel jobs and the restore list aren't available
+            print(f"Streaming dump to database: {temp_db_name}")
+            result = stream_restore(dump_stream, [
+                "pg_restore",
+                "-h", pg_host,
+                "-p", pg_port,
+                "-U", pg_user,
+                "-d", temp_db_name,
+                "--no-owner",  # Skip ownership commands
+                "--no-privileges",  # Skip privilege commands
+            ], pg_env)
+        else:
+            # Restore the dump file to the temporary database, loading only the
+            # table data the pipeline reads and running restore jobs in parallel
+            print(f"Restoring dump file to database: {temp_db_name}")
+            list_fd, list_file = tempfile.mkstemp(suffix=".list")
+            os.close(list_fd)
+            try:
+                skipped, skipped_fks = write_restore_list(dump_file, list_file, pg_env)
+                print(f"Skipping data for {skipped} tables not used by the pipeline, and {skipped_fks} foreign keys")
+                result = subprocess.run([
+                    "pg_restore",
+                    "-h", pg_host,
+                    "-p", pg_port,
+                    "-U", pg_user,
+                    "-d", temp_db_name,
+                    "-j", str(PG_RESTORE_JOBS),  # Parallel restore jobs
+                    "-L", list_file,  # Only the entries kept in the list
+                    "--no-owner",  # Skip ownership commands
+                    "--no-privileges",  # Skip privilege commands
+                    dump_file
+                ], capture_output=True, text=True, env=pg_env)
+            finally:
+                os.remove(list_file)
         
         # pg_restore often returns non-zero exit codes even when successful
         # due to warnings, so we check if the database was created
@@ -70,9 +253,11 @@ def restore_database(dump_file):
                 print(f"... and {len(stderr_lines) - 10} more lines")
             else:
                 print(f"stderr: {result.stderr}")
-            
-        # Create the materialized views
-        print("Creating materialized views for graph nodes and edges")
+        
+        # pg_restore leaves the tables without planner statistics. Add an
+        # index covering the graph edge query's reverse-link lookup and
+        # analyze the graph tables so the planner has row counts to work with
+        print("Indexing and analyzing graph tables")
         conn = psycopg2.connect(
             host=pg_host,
             port=pg_port,
@@ -81,45 +266,55 @@ def restore_database(dump_file):
             dbname=temp_db_name
         )
         cursor = conn.cursor()
-        
-        # Create graph_nodes view (includes document text for alignment classification)
-        cursor.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS graph_nodes AS
-        SELECT id, title, "urlId", "collectionId", "createdAt",
-               COALESCE(text, '') as content
-        FROM   documents
-        WHERE  "deletedAt" IS NULL;
-        """)
-        
-        # Create graph_edges view with additional metadata
         cursor.execute("""
-        CREATE MATERIALIZED VIEW IF NOT EXISTS graph_edges AS
-        SELECT "reverseDocumentId" AS source,
-               "documentId"        AS target,
-               "createdAt"         AS creation_time,
-               CASE WHEN EXISTS (
-                 SELECT 1 FROM relationships r2 
-                 WHERE r2."documentId" = relationships."reverseDocumentId" 
-                 AND r2."reverseDocumentId" = relationships."documentId"
-                 AND r2.type = 'backlink'
-               ) THEN 'bidirectional' ELSE 'unidirectional' END as direction
-        FROM   relationships
-        WHERE  type = 'backlink';
+        CREATE INDEX IF NOT EXISTS graph_backlinks_idx
+        ON relationships ("documentId", "reverseDocumentId")
+        WHERE type = 'backlink';
         """)
-        
+        cursor.execute("ANALYZE documents, relationships;")
         conn.commit()
         cursor.close()
         conn.close()
-        
+            
         return temp_db_name
         
     except subprocess.CalledProcessError as e:
         print(f"Error restoring database: {e}")
         print(f"stderr: {e.stderr if hasattr(e, 'stderr') else 'None'}")
-        return None
     except Exception as e:
         print(f"Error: {str(e)}")
-        return None
+    
+    # The caller only cleans up a database it was given, so drop a
+    # half-restored one here rather than leaving it on the server
+    if temp_db_created:
+        cleanup_database(temp_db_name)
+    return None
+
+def fetch_rows(conn_params, query, params, cursor_name):
+    """
+    Run a query on a connection of its own and return all of its rows.
+    
+    Rows are streamed through a server-side cursor in batches of itersize
+    and returned as plain tuples, rather than fetched in one go and built
+    up as RealDictRows first.
+    
+    Args:
+        conn_params (dict): Keyword arguments for psycopg2.connect
+        query (str): SQL query to run
+        params (dict): Query parameters
+        cursor_name (str): Name of the server-side cursor
+        
+    Returns:
+        list: Row tuples
+    """
+    conn = psycopg2.connect(**conn_params)
+    try:
+        with conn.cursor(name=cursor_name) as cursor:
+            cursor.itersize = 10000
+            cursor.execute(query, params)
+            return list(cursor)
+    finally:
+        conn.close()
 
 def extract_relationship_data(db_name):
     """
@@ -138,48 +333,58 @@ def extract_relationship_data(db_name):
         pg_user = os.environ.get("POSTGRES_USER", "postgres")
         pg_password = os.environ.get("POSTGRES_PASSWORD", "postgres")
         
-        print(f"Connecting to database: {db_name}")
-        conn = psycopg2.connect(
-            host=pg_host,
-            port=pg_port,
-            user=pg_user,
-            password=pg_password,
-            dbname=db_name
-        )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Extract nodes
-        print("Extracting nodes data")
-        cursor.execute("SELECT * FROM graph_nodes")
-        all_nodes = cursor.fetchall()
-        
-        # Extract edges
-        print("Extracting edges data")
-        cursor.execute("SELECT * FROM graph_edges")
-        all_links = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        conn_params = {
+            'host': pg_host,
+            'port': pg_port,
+            'user': pg_user,
+            'password': pg_password,
+            'dbname': db_name
+        }
         
-        # Filter out nodes from the private collection
+        # Leave out the private collection, and the 5E collection when the
+        # EXCLUDE_5E environment variable is set
         private_collection_id = "9870bc72-55da-4158-892c-3c54ec9e5828"
         print(f"Filtering out nodes from private collection: {private_collection_id}")
-        nodes = [node for node in all_nodes if node['collectionId'] != private_collection_id]
+        excluded = [private_collection_id]
         
-        # Check if we should exclude the 5E collection based on the EXCLUDE_5E environment variable
         exclude_5e = os.environ.get("EXCLUDE_5E", "").lower() == "true"
         if exclude_5e:
             five_e_collection_id = "7275a3d8-27da-4f63-ac39-a9bc9a1ec6d7"
             print(f"EXCLUDE_5E is set to true. Filtering out nodes from 5E collection: {five_e_collection_id}")
-            nodes = [node for node in nodes if node['collectionId'] != five_e_collection_id]
-        
-        # Get the IDs of nodes to include
-        node_ids = {node['id'] for node in nodes}
+            excluded.append(five_e_collection_id)
+        params = {'excluded': excluded}
         
-        # Filter out links that connect to excluded nodes
-        print("Filtering out links connected to excluded collection nodes")
-        links = [link for link in all_links 
-                if link['source'] in node_ids and link['target'] in node_ids]
+        # The node and edge queries run at the same time, each on its own
+        # connection, so extraction takes as long as the slower of the two
+        print(f"Connecting to database: {db_name}")
+        print("Extracting nodes and edges data")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            nodes_future = executor.submit(fetch_rows, conn_params, GRAPH_NODES_QUERY, params, "graph_nodes_cursor")
+            links_future = executor.submit(fetch_rows, conn_params, GRAPH_EDGES_QUERY, params, "graph_edges_cursor")
+            node_rows, link_rows = nodes_future.result(), links_future.result()
+        
+        nodes = [
+            {
+                'id': node_id,
+                'title': title,
+                'urlId': url_id,
+                'collectionId': collection_id,
+                'createdAt': created_at,
+                'content': content
+            }
+            for node_id, title, url_id, collection_id, created_at, content in node_rows
+        ]
+        links = [
+            {
+                'source': source,
+                'target': target,
+                'creation_time': creation_time,
+                'direction': direction
+            }
+            for source, target, creation_time, direction in link_rows
+        ]
+        
+        print(f"Extracted {len(nodes)} nodes and {len(links)} links outside excluded collections")
         
         # Remove duplicate relationships
         print("Removing duplicate relationships")
@@ -230,12 +435,10 @@ def extract_relationship_data(db_name):
         
         # Convert to D3-compatible format
         graph_data = {
-            "nodes": [dict(node) for node in nodes],
-            "links": [dict(link) for link in links]
+            "nodes": nodes,
+            "links": links
         }
         
-        print(f"Filtered out {len(all_nodes) - len(nodes)} nodes from excluded collections")
-        print(f"Filtered out {len(all_links) - len(links) + duplicates_removed} links connected to excluded collection nodes")
         print(f"Removed {duplicates_removed} duplicate relationships")
         print(f"Added connection counts to {len(nodes)} nodes")
         
@@ -272,7 +475,7 @@ def get_alignment_collections(db_name):
             password=pg_password,
             dbname=db_name
         )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
 
         # Query for collections matching our target patterns
         cursor.execute("""
@@ -295,9 +498,8 @@ def get_alignment_collections(db_name):
 
         alignment_collections = {}
 
-        for row in results:
-            name_lower = row['name'].lower()
-            collection_id = row['id']
+        for collection_id, name in results:
+            name_lower = name.lower()
 
             # Categorize by name pattern
             if 'npc' in name_lower:
@@ -336,25 +538,45 @@ def cleanup_database(db_name):
         pg_user = os.environ.get("POSTGRES_USER", "postgres")
         pg_password = os.environ.get("POSTGRES_PASSWORD", "postgres")
         
-        # Set PGPASSWORD environment variable for command-line tools
-        pg_env = os.environ.copy()
-        pg_env["PGPASSWORD"] = pg_password
-        
+        # FORCE terminates any sessions still connected to the database
+        # (PostgreSQL 13+), so a connection left open by a failed step
+        # can't stop the temporary database from being dropped
         print(f"Dropping temporary database: {db_name}")
-        subprocess.run([
-            "dropdb",
-            "-h", pg_host,
-            "-p", pg_port,
-            "-U", pg_user,
-            db_name
-        ], check=True, env=pg_env)
+        admin_conn = psycopg2.connect(
+            host=pg_host,
+            port=pg_port,
+            user=pg_user,
+            password=pg_password,
+            dbname="postgres"
+        )
+        try:
+            admin_conn.autocommit = True
+            with admin_conn.cursor() as cursor:
+                cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(db_name)))
+        finally:
+            admin_conn.close()
         print("Database dropped successfully")
-    except subprocess.CalledProcessError as e:
+    except psycopg2.Error as e:
         print(f"Error dropping database: {e}")
-        print(f"stderr: {e.stderr if hasattr(e, 'stderr') else 'None'}")
     except Exception as e:
         print(f"Error: {str(e)}")
 
+def save_json(data, output_file):
+    """
+    Save data to a JSON file indented by two spaces, using orjson when it is
+    installed since it serializes the graph many times faster than json.
+    
+    Args:
+        data: JSON-serializable data to save
+        output_file (str): Path to the output JSON file
+    """
+    if orjson:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(data, f, indent=2)
+
 def process_relationships(dump_file, output_file=None):
     """
     Process the PostgreSQL dump file and extract relationship data into a D3-compatible JSON file.
@@ -408,13 +630,11 @@ def process_relationships(dump_file, output_file=None):
         
         # Save the main graph data to a JSON file
         print(f"Saving graph data to: {output_file}")
-        with open(output_file, 'w') as f:
-            json.dump(graph_data, f, indent=2)
+        save_json(graph_data, output_file)
         
         # Save the orphaned nodes to a separate JSON file
         print(f"Saving orphaned nodes data to: {orphan_file}")
-        with open(orphan_file, 'w') as f:
-            json.dump(orphan_data, f, indent=2)
+        save_json(orphan_data, orphan_file)
         
         print(f"Graph data saved successfully")
         print(f"Nodes: {len(graph_data['nodes'])}")
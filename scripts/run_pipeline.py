@@ -2,33 +2,135 @@
 import os
 import sys
 import json
+import hashlib
 import argparse
-from download_latest_dump import download_latest_dump
-from process_relationships import process_relationships, restore_database, cleanup_database, get_alignment_collections
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from download_latest_dump import download_latest_dump, locate_latest_dump, open_latest_dump_stream
+from process_relationships import process_relationships, restore_database, cleanup_database, get_alignment_collections, save_json
 from process_colors import process_colors
+from alignment_classifier import ENTITY_PROMPT_VERSION
 
-def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
+# Sidecar next to graph_data.json recording which dump the outputs were
+# generated from, so an unchanged dump isn't restored and processed again
+DUMP_FINGERPRINT_FILE = ".dump_fingerprint.json"
+
+# In auto stream mode, dumps up to this size are piped straight into
+# pg_restore. Larger dumps are downloaded first, since a parallel restore
+# from a file saves more time than skipping the disk does
+STREAM_MAX_SIZE = int(os.environ.get("STREAM_MAX_SIZE", 256 * 1024 * 1024))
+
+def dump_fingerprint(dump_file):
+    """
+    Hash the contents of a dump file.
+    
+    Args:
+        dump_file (str): Path to the dump file
+        
+    Returns:
+        str: Hex BLAKE2b digest of the file
+    """
+    digest = hashlib.blake2b()
+    with open(dump_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def code_fingerprint():
+    """
+    Hash the pipeline scripts that shape its output, so changing any of them
+    invalidates a saved fingerprint.
+    
+    Returns:
+        str: Hex BLAKE2b digest of the scripts
+    """
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.blake2b()
+    for script in ("run_pipeline.py", "process_relationships.py", "process_colors.py", "alignment_classifier.py"):
+        with open(os.path.join(scripts_dir, script), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def load_fingerprint(fingerprint_file):
+    """
+    Load the fingerprint saved by the last successful run.
+    
+    Args:
+        fingerprint_file (str): Path to the fingerprint sidecar
+        
+    Returns:
+        dict: The saved fingerprint, or an empty dict if there is none
+    """
+    try:
+        with open(fingerprint_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def cleanup_dump_file(dump_file, keep_dump):
+    """
+    Remove the dump file unless it should be kept.
+    
+    Args:
+        dump_file (str): Path to the dump file
+        keep_dump (bool): Whether to keep the dump file
+    """
+    if not keep_dump:
+        print("\nStep 6: Cleaning up the dump file")
+        try:
+            os.remove(dump_file)
+            print(f"Dump file removed: {dump_file}")
+        except Exception as e:
+            print(f"Warning: Could not remove dump file: {str(e)}")
+    else:
+        print(f"\nDump file kept at: {dump_file}")
+
+def run_pipeline(output_file=None, keep_dump=False, dump_file=None, stream_dump=False, force=False):
     """
     Run the complete data pipeline:
-    1. Download the latest database dump (if not provided)
+    1. Download the latest database dump (if not provided and not streamed)
     2. Restore the database
     3. Process the dump to extract relationship data
     4. Process collection colors for visualization
     5. Clean up the temporary database
     6. Optionally clean up the dump file
     
+    Steps 2 to 5 are skipped when the dump is byte-identical to the one the
+    existing output files were generated from, and the settings, prompt
+    version and pipeline scripts are unchanged too, unless force is set.
+    
+    With stream_dump, the latest dump is piped from object storage straight
+    into pg_restore instead of being saved to disk first. This skips the
+    selective, parallel restore used for dump files. With stream_dump set to
+    "auto", only dumps up to STREAM_MAX_SIZE bytes are streamed.
+    
     Args:
         output_file (str, optional): Path to the output JSON file. If None, a default path will be used.
         keep_dump (bool): Whether to keep the dump file after processing
         dump_file (str, optional): Path to an existing dump file. If None, a new dump will be downloaded.
+        stream_dump (bool or str): Stream the latest dump into the database instead of downloading it,
+            or "auto" to choose by the dump's size. Ignored when dump_file is given or keep_dump is set.
+        force (bool): Regenerate the output even if the dump is unchanged since the last run
         
     Returns:
         bool: True if the pipeline completed successfully, False otherwise
     """
     # Step 1: Download the latest database dump (if not provided)
-    if dump_file is None:
+    if dump_file is not None or keep_dump:
+        stream_dump = False
+    # The dump found when choosing by size, passed on so the bucket is only
+    # listed once
+    latest_dump = None
+    if stream_dump == "auto":
+        latest_dump = locate_latest_dump()
+        dump_size = latest_dump['size']
+        stream_dump = dump_size is not None and dump_size <= STREAM_MAX_SIZE
+        print(f"Latest dump is {dump_size} bytes, {'streaming' if stream_dump else 'downloading'} it")
+    if stream_dump:
+        print("Step 1: Streaming the latest database dump during restore")
+    elif dump_file is None:
         print("Step 1: Downloading the latest database dump")
-        dump_file = download_latest_dump()
+        dump_file = download_latest_dump(latest_dump)
         if not dump_file:
             print("Pipeline failed: Could not download the latest database dump")
             return False
@@ -38,22 +140,57 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
             print(f"Pipeline failed: Provided dump file does not exist: {dump_file}")
             return False
     
+    # Set default output file if not provided
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    os.makedirs(data_dir, exist_ok=True)
+    if output_file is None:
+        output_file = os.path.join(data_dir, "graph_data.json")
+    orphan_file = os.path.join(os.path.dirname(output_file), "orphan_data.json")
+    
+    # Collection color files written by process_colors
+    static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+    color_files = [
+        os.path.join(static_dir, "css", "collection-colors.css"),
+        os.path.join(static_dir, "js", "collection-colors.js")
+    ]
+    
+    # Skip the rest of the pipeline if this dump was already processed with
+    # the same settings and code, and all of its output is still there. A
+    # streamed dump is never saved, so it can't be fingerprinted
+    fingerprint_file = os.path.join(os.path.dirname(output_file), DUMP_FINGERPRINT_FILE)
+    fingerprint = None
+    if not stream_dump:
+        fingerprint = {
+            'dump_hash': dump_fingerprint(dump_file),
+            'exclude_5e': os.environ.get("EXCLUDE_5E", "").lower() == "true",
+            'openai_api_key_set': bool(os.environ.get("OPENAI_API_KEY")),
+            'openai_batch_api': os.environ.get("OPENAI_BATCH_API", "").lower() == "true",
+            'entity_prompt_version': ENTITY_PROMPT_VERSION,
+            'code_hash': code_fingerprint()
+        }
+        previous = load_fingerprint(fingerprint_file)
+        outputs = [output_file, orphan_file] + color_files
+        if (not force and all(previous.get(key) == value for key, value in fingerprint.items())
+                and all(os.path.exists(path) for path in outputs)):
+            print(f"\nUp to date: dump unchanged since the output was generated at {previous.get('generated_at')}")
+            cleanup_dump_file(dump_file, keep_dump)
+            return True
+    
     # Step 2: Restore the database
     print("\nStep 2: Restoring the database")
-    db_name = restore_database(dump_file)
+    if stream_dump:
+        with open_latest_dump_stream(latest_dump) as (dump_name, dump_stream):
+            db_name = restore_database(dump_name, dump_stream)
+    else:
+        db_name = restore_database(dump_file)
     if not db_name:
         print("Pipeline failed: Could not restore the database")
         return False
     
+    colors_executor = ThreadPoolExecutor(max_workers=1)
     try:
         # Step 3: Process the dump to extract relationship data
         print("\nStep 3: Processing the dump to extract relationship data")
-        # Set default output file if not provided
-        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
-        os.makedirs(data_dir, exist_ok=True)
-        if output_file is None:
-            output_file = os.path.join(data_dir, "graph_data.json")
-        
         # Extract relationship data
         from process_relationships import extract_relationship_data
         graph_data = extract_relationship_data(db_name)
@@ -61,12 +198,14 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
             print("Failed to extract relationship data")
             return False
         
-        # Identify and separate orphaned nodes (nodes with 0 connections)
+        # Identify and separate orphaned nodes (nodes with 0 connections),
+        # removing them from the main graph data in the same pass
         print("Identifying orphaned nodes (nodes with 0 connections)")
-        orphaned_nodes = [node for node in graph_data['nodes'] if node['connections'] == 0]
-        
-        # Remove orphaned nodes from the main graph data
-        graph_data['nodes'] = [node for node in graph_data['nodes'] if node['connections'] > 0]
+        orphaned_nodes = []
+        connected_nodes = []
+        for node in graph_data['nodes']:
+            (connected_nodes if node['connections'] > 0 else orphaned_nodes).append(node)
+        graph_data['nodes'] = connected_nodes
         
         # Create orphan data structure
         orphan_data = {
@@ -74,25 +213,15 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
             'links': []  # No links for orphaned nodes by definition
         }
         
-        # Save the main graph data to a JSON file
-        print(f"Saving graph data to: {output_file}")
-        with open(output_file, 'w') as f:
-            json.dump(graph_data, f, indent=2)
+        # Collection colors only depend on the database, so Step 4 runs in the
+        # background while alignments are classified
+        colors_future = colors_executor.submit(process_colors, db_name)
         
-        # Save the orphaned nodes to a separate JSON file
-        orphan_file = os.path.join(os.path.dirname(output_file), "orphan_data.json")
-        print(f"Saving orphaned nodes data to: {orphan_file}")
-        with open(orphan_file, 'w') as f:
-            json.dump(orphan_data, f, indent=2)
-        
-        print(f"Graph data saved successfully")
-        print(f"Nodes: {len(graph_data['nodes'])}")
-        print(f"Links: {len(graph_data['links'])}")
-        print(f"Orphaned nodes: {len(orphaned_nodes)}")
-
         # Step 3.5: Classify alignments for relevant collections
         print("\nStep 3.5: Classifying entity alignments")
+        alignment_complete = True
         api_key = os.environ.get("OPENAI_API_KEY")
+        use_batch_api = os.environ.get("OPENAI_BATCH_API", "").lower() == "true"
 
         if api_key:
             from alignment_classifier import classify_alignments
@@ -105,21 +234,17 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
                 cache_file = os.path.join(data_dir, "alignment_cache.json")
 
                 # Run classification pipeline
-                classify_alignments(
+                alignment_complete = classify_alignments(
                     nodes=graph_data['nodes'],
                     links=graph_data['links'],
                     alignment_collections=alignment_collections,
                     cache_path=cache_file,
-                    api_key=api_key
+                    api_key=api_key,
+                    use_batch_api=use_batch_api
                 )
 
                 # Add alignment collection IDs to graph data for visualization filtering
                 graph_data['alignmentCollectionIds'] = list(alignment_collections.values())
-
-                # Re-save graph data with alignment info
-                print(f"Re-saving graph data with alignment info to: {output_file}")
-                with open(output_file, 'w') as f:
-                    json.dump(graph_data, f, indent=2)
             else:
                 print("No alignment-eligible collections found, skipping alignment classification")
         else:
@@ -130,7 +255,7 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
 
             if alignment_collections:
                 cache_file = os.path.join(data_dir, "alignment_cache.json")
-                classify_alignments(
+                alignment_complete = classify_alignments(
                     nodes=graph_data['nodes'],
                     links=graph_data['links'],
                     alignment_collections=alignment_collections,
@@ -141,33 +266,48 @@ def run_pipeline(output_file=None, keep_dump=False, dump_file=None):
                 # Add alignment collection IDs to graph data for visualization filtering
                 graph_data['alignmentCollectionIds'] = list(alignment_collections.values())
 
-                # Re-save graph data with alignment info
-                print(f"Re-saving graph data with alignment info to: {output_file}")
-                with open(output_file, 'w') as f:
-                    json.dump(graph_data, f, indent=2)
+        # Save the main graph data to a JSON file, once alignment info has
+        # been added so it is only serialized once
+        print(f"Saving graph data to: {output_file}")
+        save_json(graph_data, output_file)
+        
+        # Save the orphaned nodes to a separate JSON file
+        print(f"Saving orphaned nodes data to: {orphan_file}")
+        save_json(orphan_data, orphan_file)
+        
+        print(f"Graph data saved successfully")
+        print(f"Nodes: {len(graph_data['nodes'])}")
+        print(f"Links: {len(graph_data['links'])}")
+        print(f"Orphaned nodes: {len(orphaned_nodes)}")
 
         # Step 4: Process collection colors for visualization
         print("\nStep 4: Processing collection colors for visualization")
-        css_file, js_file = process_colors(db_name)
+        css_file, js_file = colors_future.result()
         if not css_file or not js_file:
             print("Warning: Could not process collection colors")
             # Continue with the pipeline even if color processing fails
     
     finally:
+        # Let color processing finish before its database is dropped
+        colors_executor.shutdown(wait=True)
+        
         # Step 5: Clean up the temporary database
         print("\nStep 5: Cleaning up the temporary database")
         cleanup_database(db_name)
     
+    # Record which dump the output was generated from, unless some alignments
+    # are missing and the next run should retry them
+    if fingerprint and not alignment_complete:
+        print("\nNot recording the dump fingerprint: alignment classification was incomplete")
+    elif fingerprint:
+        fingerprint['generated_at'] = datetime.now().isoformat()
+        save_json(fingerprint, fingerprint_file)
+    
     # Step 6: Clean up the dump file if not keeping it
-    if not keep_dump:
-        print("\nStep 6: Cleaning up the dump file")
-        try:
-            os.remove(dump_file)
-            print(f"Dump file removed: {dump_file}")
-        except Exception as e:
-            print(f"Warning: Could not remove dump file: {str(e)}")
+    if stream_dump:
+        print("\nStep 6: No dump file to clean up, dump was streamed")
     else:
-        print(f"\nDump file kept at: {dump_file}")
+        cleanup_dump_file(dump_file, keep_dump)
     
     print("\nPipeline completed successfully!")
     print(f"Graph data saved to: {output_file}")
@@ -180,10 +320,15 @@ def main():
     parser.add_argument('--output', '-o', help='Path to the output JSON file')
     parser.add_argument('--keep-dump', '-k', action='store_true', help='Keep the dump file after processing')
     parser.add_argument('--dump-file', '-d', help='Path to an existing dump file')
+    parser.add_argument('--force', '-f', action='store_true', help='Regenerate the output even if the dump is unchanged since the last run')
+    parser.add_argument('--stream', '-s', nargs='?', const='always', choices=['always', 'auto'],
+                        help='Stream the latest dump into the database without saving it to disk, '
+                             'or with "auto" only when it is no larger than STREAM_MAX_SIZE bytes')
     
     args = parser.parse_args()
     
-    success = run_pipeline(args.output, args.keep_dump, args.dump_file)
+    stream_dump = 'auto' if args.stream == 'auto' else args.stream == 'always'
+    success = run_pipeline(args.output, args.keep_dump, args.dump_file, stream_dump, args.force)
     if not success:
         sys.exit(1)
 
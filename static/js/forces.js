@@ -0,0 +1,22 @@
+// Force configuration shared by visualization.js and the layout worker
+
+// Apply the connection view forces to a simulation.
+// Repulsion uses a coarser Barnes-Hut approximation (theta 1.2) and ignores
+// nodes more than 500px apart; weak x/y forces take the place of a center
+// force and also keep disconnected clusters from drifting away. The faster
+// alpha decay lets the layout settle in about half the default ticks.
+// Collisions use each node's drawn radius so larger nodes don't overlap.
+function applyConnectionForces(simulation, links) {
+    return simulation
+        .alphaDecay(0.05)
+        .force("link", d3.forceLink(links)
+            .id(d => d.id)
+            .distance(100))
+        .force("charge", d3.forceManyBody()
+            .strength(-300)
+            .theta(1.2)
+            .distanceMax(500))
+        .force("x", d3.forceX(0).strength(0.02))
+        .force("y", d3.forceY(0).strength(0.02))
+        .force("collide", d3.forceCollide(d => d.radius + 2));
+}
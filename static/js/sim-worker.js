@@ -0,0 +1,39 @@
+// Web Worker that runs the initial connection view layout off the main thread
+// Positions are streamed back to visualization.js while the layout settles
+
+importScripts("https://d3js.org/d3.v7.min.js", "forces.js");
+
+// Minimum time between position updates sent to the page (about one frame)
+const POST_INTERVAL = 16;
+
+onmessage = function(event) {
+    const { nodes, links } = event.data;
+
+    const simulation = applyConnectionForces(d3.forceSimulation(nodes), links).stop();
+
+    // Send x, y, vx, vy for every node, transferring the buffer instead of copying it
+    function postPositions(done) {
+        const positions = new Float32Array(nodes.length * 4);
+        nodes.forEach((n, i) => {
+            positions[i * 4] = n.x;
+            positions[i * 4 + 1] = n.y;
+            positions[i * 4 + 2] = n.vx;
+            positions[i * 4 + 3] = n.vy;
+        });
+        postMessage({ positions, alpha: simulation.alpha(), done }, [positions.buffer]);
+    }
+
+    // Tick until the simulation cools down, as d3's own timer would
+    let lastPost = performance.now();
+    while (simulation.alpha() >= simulation.alphaMin()) {
+        simulation.tick();
+
+        const now = performance.now();
+        if (now - lastPost >= POST_INTERVAL) {
+            postPositions(false);
+            lastPost = now;
+        }
+    }
+
+    postPositions(true);
+};
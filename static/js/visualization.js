@@ -4,12 +4,35 @@
 // View mode: 'connection' or 'alignment'
 let currentViewMode = 'connection';
 
-// Create a map for quick node lookup
+// Create a map for quick node lookup, and size each node by its connections
+// once up front so the circles and the collision force share the same radius
 const nodeMap = new Map();
 graphData.nodes.forEach(node => {
     nodeMap.set(node.id, node);
+    // Increase the relative size difference between nodes
+    node.radius = node.connections ? 10 + Math.pow(node.connections, 0.8) * 2 : 10;
 });
 
+// Index links by the ids of the nodes they touch, so lookups for one node
+// don't scan every link. The link objects are shared with the simulation.
+const nodeLinks = new Map();
+graphData.nodes.forEach(node => {
+    nodeLinks.set(node.id, []);
+});
+graphData.links.forEach(link => {
+    const sourceId = typeof link.source === 'object' ? link.source.id : link.source;
+    const targetId = typeof link.target === 'object' ? link.target.id : link.target;
+    if (nodeLinks.has(sourceId)) nodeLinks.get(sourceId).push(link);
+    if (targetId !== sourceId && nodeLinks.has(targetId)) nodeLinks.get(targetId).push(link);
+});
+
+// Get the id of the node at the other end of a link
+function otherEndId(link, nodeId) {
+    const sourceId = typeof link.source === 'object' ? link.source.id : link.source;
+    const targetId = typeof link.target === 'object' ? link.target.id : link.target;
+    return sourceId === nodeId ? targetId : sourceId;
+}
+
 // Setup the visualization
 let width = 0;
 let height = 0;
@@ -62,6 +85,14 @@ svg.on("click", function(event) {
 // Create a group for zoom/pan
 const g = svg.append("g");
 
+// Below this zoom scale node labels are too small to read, so they are hidden
+// to save the browser laying out and painting text nobody can see
+const LABEL_MIN_ZOOM = 0.3;
+
+// Links are hidden while the user pans or zooms, so each frame only has to
+// move the zoom group's contents without repainting every line
+let linksHidden = false;
+
 // Add zoom behavior
 const zoom = d3.zoom()
     .scaleExtent([0.1, 8])
@@ -76,11 +107,26 @@ const zoom = d3.zoom()
     })
     .on("zoom", (event) => {
         g.attr("transform", event.transform);
+        g.classed("labels-hidden", event.transform.k < LABEL_MIN_ZOOM);
+
+        // Only hide links for user gestures, not programmatic zoom transitions
+        if (event.sourceEvent && !linksHidden) {
+            linksHidden = true;
+            g.classed("links-hidden", true);
+        }
 
         // Update tooltip position if it's visible and we have a highlighted node
         if (parseFloat(tooltipTruncated.style("opacity")) > 0 && highlightedNode) {
             updateTooltipPosition(highlightedNode, event.transform);
         }
+    })
+    .on("end", () => {
+        if (linksHidden) {
+            linksHidden = false;
+            g.classed("links-hidden", false);
+            // Catch links up with any simulation ticks skipped while hidden
+            ticked();
+        }
     });
 
 svg.call(zoom);
@@ -160,28 +206,20 @@ function hideTooltipImmediately() {
 // Returns { firstOrderNodeIds, secondOrderNodeIds, firstOrderLinks }
 function calculateNodeConnections(nodeId) {
     // Get first-order connections
-    const firstOrderLinks = graphData.links.filter(link =>
-        link.source.id === nodeId || link.target.id === nodeId
-    );
+    const firstOrderLinks = nodeLinks.get(nodeId) || [];
 
     const firstOrderNodeIds = new Set();
     firstOrderLinks.forEach(link => {
-        const connectedId = link.source.id === nodeId ? link.target.id : link.source.id;
-        firstOrderNodeIds.add(connectedId);
+        firstOrderNodeIds.add(otherEndId(link, nodeId));
     });
 
     // Get second-order connections
     const secondOrderNodeIds = new Set();
     firstOrderNodeIds.forEach(firstNodeId => {
-        graphData.links.forEach(link => {
-            if (link.source.id === firstNodeId) {
-                if (link.target.id !== nodeId && !firstOrderNodeIds.has(link.target.id)) {
-                    secondOrderNodeIds.add(link.target.id);
-                }
-            } else if (link.target.id === firstNodeId) {
-                if (link.source.id !== nodeId && !firstOrderNodeIds.has(link.source.id)) {
-                    secondOrderNodeIds.add(link.source.id);
-                }
+        (nodeLinks.get(firstNodeId) || []).forEach(link => {
+            const connectedId = otherEndId(link, firstNodeId);
+            if (connectedId !== nodeId && !firstOrderNodeIds.has(connectedId)) {
+                secondOrderNodeIds.add(connectedId);
             }
         });
     });
@@ -211,29 +249,14 @@ function findShortestPath(startId, endId) {
     const alignmentCollectionIds = new Set(graphData.alignmentCollectionIds || []);
     const isAlignmentView = currentViewMode === 'alignment';
 
-    // Build adjacency list from links
-    const adjacency = new Map();
-
-    // Only include nodes that are visible in the current view
-    graphData.nodes.forEach(n => {
-        if (!isAlignmentView || alignmentCollectionIds.has(n.collectionId)) {
-            adjacency.set(n.id, []);
-        }
-    });
-
-    graphData.links.forEach(l => {
-        const sourceId = typeof l.source === 'object' ? l.source.id : l.source;
-        const targetId = typeof l.target === 'object' ? l.target.id : l.target;
-
-        // Only add edge if both nodes are in the adjacency list (visible in current view)
-        if (adjacency.has(sourceId) && adjacency.has(targetId)) {
-            adjacency.get(sourceId).push(targetId);
-            adjacency.get(targetId).push(sourceId);
-        }
-    });
+    // Only consider nodes that are visible in the current view
+    const isVisible = id => {
+        const n = nodeMap.get(id);
+        return n !== undefined && (!isAlignmentView || alignmentCollectionIds.has(n.collectionId));
+    };
 
     // Check if start and end nodes are valid for current view
-    if (!adjacency.has(startId) || !adjacency.has(endId)) {
+    if (!isVisible(startId) || !isVisible(endId)) {
         return null;
     }
 
@@ -245,7 +268,9 @@ function findShortestPath(startId, endId) {
         const path = queue.shift();
         const current = path[path.length - 1];
 
-        for (const neighbor of adjacency.get(current) || []) {
+        for (const l of nodeLinks.get(current) || []) {
+            const neighbor = otherEndId(l, current);
+            if (!isVisible(neighbor)) continue;
             if (neighbor === endId) {
                 return [...path, neighbor];
             }
@@ -285,19 +310,15 @@ function applyPathHighlights(pathNodeIds) {
     const startId = pathNodeIds[0];
     const endId = pathNodeIds[pathNodeIds.length - 1];
 
-    // Create set of link indices that are on the path
-    const pathLinkIndices = new Set();
+    // Create set of links that are on the path
+    const pathLinks = new Set();
     for (let i = 0; i < pathNodeIds.length - 1; i++) {
         const currentId = pathNodeIds[i];
         const nextId = pathNodeIds[i + 1];
 
-        link.each(function(l, idx) {
-            const sourceId = typeof l.source === 'object' ? l.source.id : l.source;
-            const targetId = typeof l.target === 'object' ? l.target.id : l.target;
-
-            if ((sourceId === currentId && targetId === nextId) ||
-                (sourceId === nextId && targetId === currentId)) {
-                pathLinkIndices.add(idx);
+        (nodeLinks.get(currentId) || []).forEach(l => {
+            if (otherEndId(l, currentId) === nextId) {
+                pathLinks.add(l);
             }
         });
     }
@@ -309,8 +330,8 @@ function applyPathHighlights(pathNodeIds) {
         .classed("node-dimmed", d => !pathSet.has(d.id));
 
     // Apply link classes
-    link.classed("link-path", (l, i) => pathLinkIndices.has(i))
-        .classed("link-dimmed", (l, i) => !pathLinkIndices.has(i));
+    link.classed("link-path", l => pathLinks.has(l))
+        .classed("link-dimmed", l => !pathLinks.has(l));
 
     // First lower all elements to reset z-order
     node.lower();
@@ -712,19 +733,16 @@ alignmentGrid.append("text")
     .text("CHAOTIC");
 
 // Create the force simulation
-const simulation = d3.forceSimulation(graphData.nodes)
-    .force("link", d3.forceLink(graphData.links)
-        .id(d => d.id)
-        .distance(100))
-    .force("charge", d3.forceManyBody().strength(-300))
-    .force("center", d3.forceCenter(0, 0))
-    .force("collide", d3.forceCollide(30));
+// It starts stopped; the initial layout runs in a Web Worker when possible
+const simulation = applyConnectionForces(d3.forceSimulation(graphData.nodes), graphData.links)
+    .stop();
 
 // Store original force configuration for connection mode
 const connectionForces = {
     link: simulation.force("link"),
     charge: simulation.force("charge"),
-    center: simulation.force("center"),
+    x: simulation.force("x"),
+    y: simulation.force("y"),
     collide: simulation.force("collide")
 };
 
@@ -732,6 +750,9 @@ const connectionForces = {
 function switchToAlignmentMode() {
     currentViewMode = 'alignment';
 
+    // Take over the layout from the worker before changing forces
+    stopLayoutWorker();
+
     // Show alignment grid
     alignmentGrid.style("display", "block");
 
@@ -743,7 +764,8 @@ function switchToAlignmentMode() {
             .strength(0.05)) // Very weak links in alignment mode
         .force("charge", d3.forceManyBody()
             .strength(-200)) // Stronger repulsion to spread nodes out
-        .force("center", null) // Remove center force
+        .force("x", null) // Remove centering forces
+        .force("y", null)
         .force("alignX", d3.forceX(d => {
             if (d.alignment && d.alignment.final) {
                 // law_chaos: -1 (chaotic/right) to 1 (lawful/left)
@@ -829,6 +851,9 @@ function clearAlignmentDefaultStyles() {
 function switchToConnectionMode() {
     currentViewMode = 'connection';
 
+    // Take over the layout from the worker before changing forces
+    stopLayoutWorker();
+
     // Hide alignment grid
     alignmentGrid.style("display", "none");
 
@@ -836,15 +861,9 @@ function switchToConnectionMode() {
     clearAlignmentDefaultStyles();
 
     // Restore original forces
-    simulation
-        .force("link", d3.forceLink(graphData.links)
-            .id(d => d.id)
-            .distance(100))
-        .force("charge", d3.forceManyBody().strength(-300))
-        .force("center", d3.forceCenter(0, 0))
+    applyConnectionForces(simulation, graphData.links)
         .force("alignX", null)
-        .force("alignY", null)
-        .force("collide", d3.forceCollide(30));
+        .force("alignY", null);
 
     // Show all nodes again
     node.interrupt().transition()
@@ -909,12 +928,7 @@ const node = g.append("g")
 
 // Add circles to nodes
 node.append("circle")
-    .attr("r", d => {
-        // Increase the relative size difference between nodes
-        // Store the radius on the data object for later use
-        d.radius = d.connections ? 10 + Math.pow(d.connections, 0.8) * 2 : 10;
-        return d.radius;
-    })
+    .attr("r", d => d.radius)
     .attr("fill", d => getNodeColor(d))
     .attr("stroke", "#fff")
     .attr("stroke-width", 1.5)
@@ -1312,20 +1326,102 @@ node.append("text")
     .style("opacity", 0.9)
     .style("pointer-events", "none"); // Ensure text doesn't interfere with mouse events
 
+// Give each node group a single translate transform that ticks update in
+// place, instead of building and re-parsing a "translate(x,y)" string for
+// every node on every tick. Entries follow graphData.nodes order.
+const nodeTransforms = [];
+node.each(function() {
+    nodeTransforms.push(this.transform.baseVal.initialize(svg.node().createSVGTransform()));
+});
+
 // Update positions on each tick
-simulation.on("tick", () => {
-    link
-        .attr("x1", d => d.source.x)
-        .attr("y1", d => d.source.y)
-        .attr("x2", d => d.target.x)
-        .attr("y2", d => d.target.y);
+function ticked() {
+    if (!linksHidden) {
+        link
+            .attr("x1", d => d.source.x)
+            .attr("y1", d => d.source.y)
+            .attr("x2", d => d.target.x)
+            .attr("y2", d => d.target.y);
+    }
     
-    node
-        .attr("transform", d => `translate(${d.x},${d.y})`);
-});
+    graphData.nodes.forEach((d, i) => {
+        nodeTransforms[i].setTranslate(d.x, d.y);
+    });
+}
+
+simulation.on("tick", ticked);
+
+// Worker running the initial layout, or null once the main thread owns it
+let layoutWorker = null;
+let layoutFramePending = false;
+
+// Start the initial layout in a Web Worker so ticks don't block pan, zoom
+// and search. Returns false if workers are unavailable (e.g. pages opened
+// from file://), in which case the caller runs the simulation here instead.
+function startLayoutWorker() {
+    try {
+        layoutWorker = new Worker("js/sim-worker.js");
+    } catch (e) {
+        layoutWorker = null;
+        return false;
+    }
+
+    layoutWorker.onmessage = function(event) {
+        const { positions, alpha, done } = event.data;
+
+        graphData.nodes.forEach((n, i) => {
+            n.x = positions[i * 4];
+            n.y = positions[i * 4 + 1];
+            n.vx = positions[i * 4 + 2];
+            n.vy = positions[i * 4 + 3];
+        });
+        simulation.alpha(alpha);
+
+        // Render at most once per frame however fast updates arrive
+        if (!layoutFramePending) {
+            layoutFramePending = true;
+            requestAnimationFrame(() => {
+                layoutFramePending = false;
+                ticked();
+            });
+        }
+
+        if (done) {
+            stopLayoutWorker();
+        }
+    };
+
+    // If the worker fails (e.g. d3 can't be loaded), finish the layout here
+    layoutWorker.onerror = function(event) {
+        event.preventDefault();
+        stopLayoutWorker();
+        simulation.restart();
+    };
+
+    layoutWorker.postMessage({
+        nodes: graphData.nodes.map(n => ({ id: n.id, x: n.x, y: n.y, radius: n.radius })),
+        links: graphData.links.map(l => ({ source: l.source.id, target: l.target.id }))
+    });
+
+    return true;
+}
+
+// Stop the layout worker, leaving the simulation with its latest positions
+function stopLayoutWorker() {
+    if (layoutWorker) {
+        layoutWorker.terminate();
+        layoutWorker = null;
+    }
+}
+
+if (!startLayoutWorker()) {
+    simulation.restart();
+}
 
 // Helper functions
 function dragstarted(event, d) {
+    // Take over the layout from the worker before moving nodes
+    stopLayoutWorker();
     if (!event.active) simulation.alphaTarget(0.3).restart();
     d.fx = d.x;
     d.fy = d.y;
@@ -1361,6 +1457,9 @@ function getNodeColor(node) {
 const searchInput = document.getElementById("search-input");
 const searchResults = document.getElementById("search-results");
 
+// Lowercased titles, computed once rather than on every search
+const lowerTitles = graphData.nodes.map(node => node.title.toLowerCase());
+
 // Debounce helper function
 function debounce(func, wait) {
     let timeout;
@@ -1381,10 +1480,13 @@ const handleSearch = debounce(function(query) {
         return;
     }
 
-    // Filter nodes based on search query
-    const matchingNodes = graphData.nodes.filter(node =>
-        node.title.toLowerCase().includes(query)
-    ).slice(0, 10); // Limit to 10 results
+    // Filter nodes based on search query, stopping at 10 results
+    const matchingNodes = [];
+    for (let i = 0; i < lowerTitles.length && matchingNodes.length < 10; i++) {
+        if (lowerTitles[i].includes(query)) {
+            matchingNodes.push(graphData.nodes[i]);
+        }
+    }
 
     // Build results using document fragment for better performance
     const fragment = document.createDocumentFragment();